@@ -6,16 +6,33 @@ Creates a clean production distribution with only the necessary files
 for deployment and operation, with version management and archive creation.
 """
 
+import argparse
+import gzip
+import io
 import os
 import shutil
+import subprocess
 import sys
 import tarfile
 import json
-import tomllib
+import re
+import time
+from contextlib import contextmanager, redirect_stdout
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
+from typing import BinaryIO, Optional
 
+# Read source files into the archive in 1 MiB blocks (tarfile defaults to 16 KiB)
+COPY_BUFSIZE = 1024 * 1024
 
+# pyproject.toml patterns for reading project.version without a TOML parser
+PROJECT_SECTION_RE = re.compile(r"^\[project\]\s*$", re.M)
+NEXT_SECTION_RE = re.compile(r"^\[", re.M)
+VERSION_RE = re.compile(r'^version\s*=\s*"([^"]+)"', re.M)
+
+
+@lru_cache(maxsize=None)
 def get_version():
     """Extract version from pyproject.toml."""
     server_dir = Path(__file__).parent
@@ -26,112 +43,180 @@ def get_version():
         return "1.0.0"
     
     try:
-        with open(pyproject_path, "rb") as f:
-            data = tomllib.load(f)
-            return data.get("project", {}).get("version", "1.0.0")
+        text = pyproject_path.read_text(encoding="utf-8")
+        
+        # Only project.version is needed, so scan the [project] table
+        # directly instead of building the full TOML document
+        section = PROJECT_SECTION_RE.search(text)
+        if section:
+            body = text[section.end():]
+            next_section = NEXT_SECTION_RE.search(body)
+            if next_section:
+                body = body[:next_section.start()]
+            match = VERSION_RE.search(body)
+            if match:
+                return match.group(1)
+        
+        # Unusual layouts (inline tables, single quotes, ...) go through tomllib
+        import tomllib
+        data = tomllib.loads(text)
+        return data.get("project", {}).get("version", "1.0.0")
     except Exception as e:
         print(f"Warning: Failed to read version from pyproject.toml: {e}")
         return "1.0.0"
 
 
-def create_version_info(version: str, dist_dir: Path):
-    """Create version information file."""
+def write_blob(path: Path, data: bytes, mode: int = 0o644):
+    """Write a small generated file with a single unbuffered write."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def create_version_info(version: str):
+    """Create version information and its serialized version.json content."""
     version_info = {
         "version": version,
         "build_date": datetime.now(timezone.utc).isoformat(),
         "component": "unix-socket-bridge-server"
     }
     
-    version_file = dist_dir / "version.json"
-    with open(version_file, "w") as f:
-        json.dump(version_info, f, indent=2)
-    
     print(f"  Created: version.json (v{version})")
-    return version_info
+    return version_info, json.dumps(version_info, indent=2).encode("utf-8")
 
 
+# Archive file suffix for each --compress choice
+ARCHIVE_SUFFIXES = {
+    "gz": ".tar.gz",
+    "zst": ".tar.zst",
+    "none": ".tar",
+}
 
-def main():
-    """Build the distribution package."""
-    # Get version first
-    version = get_version()
-    
-    # Get the project root directory
-    server_dir = Path(__file__).parent
-    project_root = server_dir.parent
-    dist_dir = server_dir / "dist"
-    
-    print(f"Building Unix Socket Bridge server distribution v{version}...")
-    
-    # Clean existing dist directory
-    if dist_dir.exists():
-        print(f"Removing existing dist directory: {dist_dir}")
-        shutil.rmtree(dist_dir)
-    
-    # Create dist directory structure
-    print(f"Creating dist directory: {dist_dir}")
-    dist_dir.mkdir()
-    
-    # Create temporary build directory for staging
-    temp_build_dir = server_dir / "temp_build"
-    if temp_build_dir.exists():
-        shutil.rmtree(temp_build_dir)
-    temp_build_dir.mkdir()
-    
-    # Create subdirectories in temp build
-    (temp_build_dir / "examples").mkdir()
-    (temp_build_dir / "systemd").mkdir()
+
+@contextmanager
+def pipe_archive(out: BinaryIO, command: list):
+    """Stream a tar archive through an external compressor into out."""
+    out.flush()
+    proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=out)
+    try:
+        # Streaming mode ("w|") never seeks, so it can write into a pipe
+        with tarfile.open(fileobj=proc.stdin, mode="w|", copybufsize=COPY_BUFSIZE) as tar:
+            yield tar
+    finally:
+        proc.stdin.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise RuntimeError(f"{os.path.basename(command[0])} exited with status {returncode}")
+
+
+@contextmanager
+def open_archive(out: BinaryIO, compress: str = "gz", compresslevel: int = 6):
+    """Open a tar stream writing to out with the requested compression.
     
-    # Copy core server files
-    print("Copying core server files...")
-    core_files = [
-        "socket-server.py",
-        "cli-client.py", 
-        "generate-token-hash.py"
-    ]
+    gzip uses pigz across all cores when available and otherwise falls back
+    to the single-threaded zlib compressor. zstd requires the zstd binary;
+    "none" writes a plain, uncompressed tar. Nothing seeks, so out may be a
+    pipe such as stdout.
+    """
+    threads = os.cpu_count() or 1
     
-    for file in core_files:
-        src = server_dir / file
-        if src.exists():
-            dst = temp_build_dir / file
-            shutil.copy2(src, dst)
-            print(f"  Copied: {file}")
-        else:
-            print(f"  Warning: {file} not found, skipping")
+    if compress == "none":
+        with tarfile.open(fileobj=out, mode="w|", copybufsize=COPY_BUFSIZE) as tar:
+            yield tar
+        return
     
-    # Copy examples
-    print("Copying example configurations...")
-    examples_src = project_root / "examples"
-    if examples_src.exists():
-        for example_file in examples_src.glob("*.json"):
-            dst = temp_build_dir / "examples" / example_file.name
-            shutil.copy2(example_file, dst)
-            print(f"  Copied: examples/{example_file.name}")
+    if compress == "zst":
+        zstd = shutil.which("zstd")
+        if not zstd:
+            raise RuntimeError("zstd compression requested but the zstd binary is not on PATH")
+        print(f"  Compressing with zstd ({threads} threads)")
+        with pipe_archive(out, [zstd, "-q", f"-T{threads}", f"-{compresslevel}"]) as tar:
+            yield tar
+        return
     
-    # Copy systemd service files
-    print("Copying systemd service files...")
-    systemd_src = project_root / "systemd"
-    if systemd_src.exists():
-        for service_file in systemd_src.glob("*"):
-            if service_file.is_file():
-                dst = temp_build_dir / "systemd" / service_file.name
-                shutil.copy2(service_file, dst)
-                print(f"  Copied: systemd/{service_file.name}")
+    pigz = shutil.which("pigz")
+    if not pigz:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=out, compresslevel=compresslevel) as gz:
+            with tarfile.open(fileobj=gz, mode="w|", copybufsize=COPY_BUFSIZE) as tar:
+                yield tar
+        return
     
-    # Copy documentation files
-    print("Copying documentation...")
-    doc_files = ["README.md", "LICENSE", "SECURITY.md"]
-    for doc_file in doc_files:
-        src = project_root / doc_file
-        if src.exists():
-            dst = temp_build_dir / doc_file
-            shutil.copy2(src, dst)
-            print(f"  Copied: {doc_file}")
+    print(f"  Compressing with pigz ({threads} threads)")
+    with pipe_archive(out, [pigz, "-p", str(threads), f"-{compresslevel}"]) as tar:
+        yield tar
+
+
+def write_members(tar: tarfile.TarFile, archive_root: str, entries: list, generated: list, version_data: bytes):
+    """Write source files and generated content into the archive."""
+    for src, arcname in entries:
+        tar.add(src, arcname=f"{archive_root}/{arcname}", recursive=False, filter=normalize_tarinfo)
+    for arcname, data, mode in generated:
+        add_blob(tar, f"{archive_root}/{arcname}", data, mode)
+    add_blob(tar, f"{archive_root}/version.json", version_data)
+
+
+def parse_args(argv=None):
+    """Parse build options."""
+    parser = argparse.ArgumentParser(description="Build the Unix Socket Bridge server distribution")
+    parser.add_argument(
+        "--compress",
+        choices=sorted(ARCHIVE_SUFFIXES),
+        default="gz",
+        help="Archive compression (default: gz; 'none' skips compression for local builds)"
+    )
+    parser.add_argument(
+        "--compresslevel",
+        type=int,
+        default=6,
+        help="Compression level passed to gzip/zstd (default: 6)"
+    )
+    parser.add_argument(
+        "--keep-unpacked",
+        action="store_true",
+        help="Also write version.json next to the archive in dist/"
+    )
+    parser.add_argument(
+        "--stdout",
+        action="store_true",
+        help="Write the archive to stdout instead of dist/ (progress goes to stderr)"
+    )
+    args = parser.parse_args(argv)
+    if args.stdout and args.keep_unpacked:
+        parser.error("--keep-unpacked cannot be combined with --stdout")
+    if args.stdout and sys.stdout.isatty():
+        parser.error("refusing to write the archive to a terminal; redirect stdout")
+    if args.compress == "zst" and not shutil.which("zstd"):
+        parser.error("--compress zst requires the zstd binary on PATH")
+    return args
+
+
+def normalize_tarinfo(info: tarfile.TarInfo) -> tarfile.TarInfo:
+    """Give archive members root ownership and plain 0755/0644 permissions.
     
-    # Create installation script
-    print("Creating installation script...")
-    install_script = temp_build_dir / "install.sh"
-    install_content = """#!/bin/bash
+    Keeps the builder's uid/gid and umask out of the release archive.
+    """
+    info.uid = info.gid = 0
+    info.uname = info.gname = "root"
+    info.mode = 0o755 if info.mode & 0o111 else 0o644
+    return info
+
+
+def add_blob(tar: tarfile.TarFile, arcname: str, data: bytes, mode: int = 0o644):
+    """Add an in-memory file to the archive without touching disk."""
+    info = tarfile.TarInfo(arcname)
+    info.size = len(data)
+    info.mode = mode
+    info.mtime = int(time.time())
+    tar.addfile(normalize_tarinfo(info), io.BytesIO(data))
+
+
+# Generated files shipped in the archive. Kept at module level so main()
+# doesn't rebuild them on every call and tests can inspect them directly.
+_INSTALL_SH = """#!/bin/bash
 set -e
 
 echo "Installing Unix Socket Bridge Server..."
@@ -168,16 +253,7 @@ echo "  3. Example: sudo systemctl enable --now socket-bridge@playerctl"
 echo ""
 echo "For more information, see README.md"
 """
-    
-    with open(install_script, 'w') as f:
-        f.write(install_content)
-    install_script.chmod(0o755)
-    print(f"  Created: install.sh")
-    
-    # Create uninstall script
-    print("Creating uninstall script...")
-    uninstall_script = temp_build_dir / "uninstall.sh"
-    uninstall_content = """#!/bin/bash
+_UNINSTALL_SH = """#!/bin/bash
 set -e
 
 echo "Uninstalling Unix Socket Bridge Server..."
@@ -220,16 +296,7 @@ fi
 
 echo "Uninstallation complete!"
 """
-    
-    with open(uninstall_script, 'w') as f:
-        f.write(uninstall_content)
-    uninstall_script.chmod(0o755)
-    print(f"  Created: uninstall.sh")
-    
-    # Create simple deployment README
-    print("Creating deployment README...")
-    deploy_readme = temp_build_dir / "DEPLOY.md"
-    deploy_content = """# Unix Socket Bridge Server Deployment
+_DEPLOY_MD = """# Unix Socket Bridge Server Deployment
 
 This distribution contains everything needed to deploy the Unix Socket Bridge server.
 
@@ -304,49 +371,145 @@ Then update your configuration files with the generated hash.
 
 See the main README.md for detailed configuration and troubleshooting information.
 """
+
+_INSTALL_SH_BYTES = _INSTALL_SH.encode("utf-8")
+_UNINSTALL_SH_BYTES = _UNINSTALL_SH.encode("utf-8")
+_DEPLOY_MD_BYTES = _DEPLOY_MD.encode("utf-8")
+
+
+def main(compress: str = "gz", compresslevel: int = 6, keep_unpacked: bool = False,
+         stream: Optional[BinaryIO] = None):
+    """Build the distribution package.
+    
+    When stream is given the archive is written to it and dist/ is left alone.
+    """
+    # Get version first
+    version = get_version()
+    
+    # Get the project root directory
+    server_dir = Path(__file__).parent
+    project_root = server_dir.parent
+    dist_dir = server_dir / "dist"
+    
+    print(f"Building Unix Socket Bridge server distribution v{version}...")
+    
+    if stream is None:
+        # Clean existing dist directory
+        if dist_dir.exists():
+            print(f"Removing existing dist directory: {dist_dir}")
+            shutil.rmtree(dist_dir)
+        
+        # Create dist directory structure
+        print(f"Creating dist directory: {dist_dir}")
+        dist_dir.mkdir()
     
-    with open(deploy_readme, 'w') as f:
-        f.write(deploy_content)
+    archive_root = f"unix-socket-bridge-server-v{version}"
+    suffix = ARCHIVE_SUFFIXES[compress]
+    archive_name = f"{archive_root}{suffix}"
+    archive_path = dist_dir / archive_name
+    
+    # Collect (source, arcname) pairs; files are streamed straight into the
+    # archive instead of being staged in a temporary build directory
+    entries = []
+    
+    # Core server files
+    print("Collecting core server files...")
+    core_files = [
+        "socket-server.py",
+        "cli-client.py", 
+        "generate-token-hash.py"
+    ]
+    
+    for file in core_files:
+        src = server_dir / file
+        if src.exists():
+            entries.append((src, file))
+            print(f"  Added: {file}")
+        else:
+            print(f"  Warning: {file} not found, skipping")
+    
+    # Examples
+    print("Collecting example configurations...")
+    examples_src = project_root / "examples"
+    if examples_src.exists():
+        with os.scandir(examples_src) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    entries.append((entry.path, f"examples/{entry.name}"))
+                    print(f"  Added: examples/{entry.name}")
+    
+    # Systemd service files
+    print("Collecting systemd service files...")
+    systemd_src = project_root / "systemd"
+    if systemd_src.exists():
+        with os.scandir(systemd_src) as it:
+            for entry in it:
+                if entry.is_file():
+                    entries.append((entry.path, f"systemd/{entry.name}"))
+                    print(f"  Added: systemd/{entry.name}")
+    
+    # Documentation files
+    print("Collecting documentation...")
+    doc_files = ["README.md", "LICENSE", "SECURITY.md"]
+    for doc_file in doc_files:
+        src = project_root / doc_file
+        if src.exists():
+            entries.append((src, doc_file))
+            print(f"  Added: {doc_file}")
+    
+    # Create installation script
+    print("Creating installation script...")
+    generated = [("install.sh", _INSTALL_SH_BYTES, 0o755)]
+    print(f"  Created: install.sh")
+    
+    # Create uninstall script
+    print("Creating uninstall script...")
+    generated.append(("uninstall.sh", _UNINSTALL_SH_BYTES, 0o755))
+    print(f"  Created: uninstall.sh")
+    
+    # Create simple deployment README
+    print("Creating deployment README...")
+    generated.append(("DEPLOY.md", _DEPLOY_MD_BYTES, 0o644))
     print(f"  Created: DEPLOY.md")
     
-    # Create version information file in dist directory
+    # Create version information (stored inside the archive)
     print("Creating version information...")
-    version_info = create_version_info(version, dist_dir)
+    version_info, version_data = create_version_info(version)
+    if keep_unpacked:
+        write_blob(dist_dir / "version.json", version_data)
     
-    # Create versioned archive from temp build directory
+    # Stream sources and generated files into the versioned archive
     print(f"\n{'='*60}")
-    print("Creating archive from build files...")
-    archive_name = f"unix-socket-bridge-server-v{version}.tar.gz"
-    archive_path = dist_dir / archive_name
+    if stream is not None:
+        print(f"Writing archive {archive_name} to stdout")
+        with open_archive(stream, compress, compresslevel) as tar:
+            write_members(tar, archive_root, entries, generated, version_data)
+        stream.flush()
+        return None
     
     print(f"Creating archive: {archive_path}")
-    with tarfile.open(archive_path, "w:gz") as tar:
-        for item in temp_build_dir.rglob("*"):
-            if item.is_file():
-                # Use relative path within the archive
-                arcname = f"unix-socket-bridge-server-v{version}/{item.relative_to(temp_build_dir)}"
-                tar.add(item, arcname=arcname)
+    with open(archive_path, "wb") as out:
+        with open_archive(out, compress, compresslevel) as tar:
+            write_members(tar, archive_root, entries, generated, version_data)
     
     # Create latest symlink
-    latest_link = dist_dir / "unix-socket-bridge-server-latest.tar.gz"
+    latest_link = dist_dir / f"unix-socket-bridge-server-latest{suffix}"
     if latest_link.is_symlink() or latest_link.exists():
         latest_link.unlink()
     latest_link.symlink_to(archive_name)
     
-    # Clean up temp build directory
-    print("Cleaning up temporary build files...")
-    shutil.rmtree(temp_build_dir)
-    
     # Print summary
     print(f"\n{'='*60}")
     print("Distribution build complete!")
     print(f"Location: {dist_dir}")
     print(f"Version: {version}")
     print("\nFinal contents:")
-    for item in sorted(dist_dir.rglob("*")):
-        if item.is_file():
-            rel_path = item.relative_to(dist_dir)
-            print(f"  {rel_path}")
+    contents = []
+    for dirpath, _dirnames, filenames in os.walk(dist_dir):
+        for filename in filenames:
+            contents.append(os.path.relpath(os.path.join(dirpath, filename), dist_dir))
+    for rel_path in sorted(contents):
+        print(f"  {rel_path}")
     
     # Print archive information
     archive_size = archive_path.stat().st_size
@@ -364,4 +527,11 @@ See the main README.md for detailed configuration and troubleshooting informatio
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.stdout:
+        # Keep stdout clean for the archive bytes; progress goes to stderr
+        archive_stream = sys.stdout.buffer
+        with redirect_stdout(sys.stderr):
+            main(args.compress, args.compresslevel, stream=archive_stream)
+    else:
+        main(args.compress, args.compresslevel, args.keep_unpacked)
\ No newline at end of file
@@ -6,43 +6,144 @@ Command-line interface for interacting with configurable Unix socket servers.
 
 import socket
 import json
-import argparse
 import sys
 import os
-from typing import Dict, Any, Optional, List
-from pathlib import Path
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Dict, Any, Optional, List
+from functools import lru_cache
+from itertools import zip_longest
 import time
 
+if TYPE_CHECKING:
+    import argparse  # Only for build_parser's annotation; imported lazily at runtime
+
+try:
+    import orjson  # Optional: faster request encoding and response parsing/printing
+except ImportError:
+    orjson = None
+
+def loads_response(data):
+    """Parse a JSON response (str or bytes), using orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Reused for every pretty-print when orjson is missing instead of building
+# a new encoder per json.dumps call (verbose mode prints twice per request)
+_PRETTY_ENCODER = json.JSONEncoder(indent=2, ensure_ascii=False)
+# Wire requests carry no whitespace between tokens, matching orjson's output
+_COMPACT_ENCODER = json.JSONEncoder(separators=(',', ':'))
+
+def dumps_request(obj: Any) -> bytes:
+    """Serialize a request for the wire, using orjson when installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # Non-string keys, >64-bit ints etc. that only json handles
+    return _COMPACT_ENCODER.encode(obj).encode()
+
+def dumps_pretty(obj: Any) -> str:
+    """Serialize an object as indented JSON for display"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+        except TypeError:
+            pass  # Same fallback as dumps_request
+    return _PRETTY_ENCODER.encode(obj)
+
 class SocketClient:
-    def __init__(self, socket_path: str, timeout: int = 10, verbose: bool = False):
+    __slots__ = ('socket_path', 'timeout', 'verbose', 'max_response_size', 'keep_alive', '_sock')
+    
+    # 64 KiB reads keep large introspection responses to a handful of recv() calls
+    recv_buffer_size = 65536
+    
+    def __init__(self, socket_path: str, timeout: int = 10, verbose: bool = False,
+                 keep_alive: bool = False):
         self.socket_path = socket_path
         self.timeout = timeout
         self.verbose = verbose
         self.max_response_size = 1048576  # 1MB default
+        self.keep_alive = keep_alive
+        self._sock = None  # Open connection kept between requests in keep-alive mode
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Close the kept-alive connection, if any"""
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+    
+    def _take_open_connection(self) -> Optional[socket.socket]:
+        """Return the kept-alive connection if the server has not closed it"""
+        sock, self._sock = self._sock, None
+        if sock is None:
+            return None
+        try:
+            sock.setblocking(False)
+            if sock.recv(1, socket.MSG_PEEK) == b'':
+                sock.close()  # Server closed the idle connection
+                return None
+        except BlockingIOError:
+            pass  # Nothing pending, connection still open
+        except OSError:
+            sock.close()
+            return None
+        sock.settimeout(self.timeout)
+        return sock
         
     def receive_full_response(self, client_socket: socket.socket) -> str:
         """Receive complete response from server, handling large messages"""
-        data = b""
+        return self.receive_response_bytes(client_socket).decode('utf-8')
+    
+    def receive_response_bytes(self, client_socket: socket.socket) -> bytearray:
+        """Receive complete raw response from server without decoding it"""
+        return self._receive(client_socket)[0]
+    
+    def receive_response(self, client_socket: socket.socket) -> Dict[str, Any]:
+        """Receive and parse a response, reusing the completeness check's parse"""
+        data, response = self._receive(client_socket)
+        if response is None:
+            response = loads_response(data)
+        return response
+    
+    def _receive(self, client_socket: socket.socket):
+        """Read a response; returns (raw bytes, parsed JSON or None if never parsed)"""
+        data = bytearray()
+        response = None
+        # Bind lookups used on every iteration to locals
+        recv = client_socket.recv
+        bufsize = self.recv_buffer_size
+        max_size = self.max_response_size
         
         while True:
             try:
-                chunk = client_socket.recv(8192)
+                chunk = recv(bufsize)
                 if not chunk:
                     break
                     
-                data += chunk
+                data.extend(chunk)
                 
                 # Check size limit
-                if len(data) > self.max_response_size:
-                    raise ValueError(f"Response too large (max {self.max_response_size} bytes)")
+                if len(data) > max_size:
+                    raise ValueError(f"Response too large (max {max_size} bytes)")
                 
-                # Try to decode and parse as JSON to check if message is complete
+                # Responses are single JSON objects, so the message can only be
+                # complete once a chunk ends with '}'; skip parsing until then
+                if not chunk.endswith(b"}"):
+                    continue
                 try:
-                    json.loads(data.decode('utf-8'))
+                    response = loads_response(data)
                     break  # Valid JSON received, message is complete
                 except json.JSONDecodeError:
-                    # If we haven't received data for a bit, assume we're done
-                    client_socket.settimeout(0.1)
                     continue
                 except UnicodeDecodeError:
                     raise ValueError("Invalid UTF-8 in response")
@@ -55,40 +156,53 @@ class SocketClient:
         if not data:
             raise ValueError("Empty response from server")
             
-        return data.decode('utf-8')
+        return data, response
         
     def send_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Send a request to the Unix socket server"""
+        client = None
         try:
-            # Check if socket exists
-            if not os.path.exists(self.socket_path):
-                return {'success': False, 'error': f'Socket not found: {self.socket_path}'}
+            # Encode before connecting so a request that can't be encoded never
+            # leaves the server with a connection that sends nothing
+            payload = dumps_request({**request, 'keep_alive': True} if self.keep_alive else request)
             
-            # Check if we have permission to access the socket
-            if not os.access(self.socket_path, os.R_OK | os.W_OK):
-                return {'success': False, 'error': f'Permission denied: {self.socket_path}'}
+            client = self._take_open_connection()
             
-            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            client.settimeout(self.timeout)
+            if client is None:
+                # A missing socket or missing permissions surface as
+                # FileNotFoundError / PermissionError from connect()
+                client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                client.settimeout(self.timeout)
+                try:
+                    # Room for a full response so large replies drain in few reads
+                    client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.max_response_size)
+                except OSError:
+                    pass
+                
+                if self.verbose:
+                    print(f"📡 Connecting to {self.socket_path}...", file=sys.stderr)
+                
+                client.connect(self.socket_path)
             
             if self.verbose:
-                print(f"📡 Connecting to {self.socket_path}...", file=sys.stderr)
-                print(f"📤 Request: {json.dumps(request, indent=2)}", file=sys.stderr)
-            
-            client.connect(self.socket_path)
+                print(f"📤 Request: {dumps_pretty(request)}", file=sys.stderr)
             
             # Send request
-            request_json = json.dumps(request)
-            client.send(request_json.encode())
+            client.sendall(payload)
+            if not self.keep_alive:
+                # Signal end of request so the server sees EOF instead of waiting on more data
+                client.shutdown(socket.SHUT_WR)
             
-            # Receive response with proper handling for large messages
-            response_data = self.receive_full_response(client)
-            client.close()
+            # Receive response with proper handling for large messages;
+            # the completeness check's parse is reused, so bytes are parsed once
+            response = self.receive_response(client)
             
-            response = json.loads(response_data)
+            # Only reuse the connection if the server agreed to keep it open
+            if self.keep_alive and response.pop('keep_alive', False) is True:
+                self._sock, client = client, None
             
             if self.verbose:
-                print(f"📥 Response: {json.dumps(response, indent=2)}", file=sys.stderr)
+                print(f"📥 Response: {dumps_pretty(response)}", file=sys.stderr)
             
             return response
             
@@ -102,11 +216,25 @@ class SocketClient:
             return {'success': False, 'error': f'Invalid JSON response: {str(e)}'}
         except Exception as e:
             return {'success': False, 'error': f'Connection failed: {str(e)}'}
+        finally:
+            if client is not None:
+                client.close()
     
     def introspect(self) -> Dict[str, Any]:
         """Get server information and available commands"""
         return self.send_request({'command': '__introspect__'})
     
+    def list_commands(self) -> Dict[str, Any]:
+        """Get the names of available commands"""
+        response = self.send_request({'command': '__list__'})
+        if not response.get('success') and str(response.get('error', '')).startswith('Unknown command'):
+            # Older servers without __list__: fall back to full introspection
+            info = self.introspect()
+            if not info.get('success'):
+                return info
+            return {'success': True, 'commands': list(info['server_info'].get('commands', {}).keys())}
+        return response
+    
     def ping(self) -> Dict[str, Any]:
         """Ping the server"""
         return self.send_request({'command': '__ping__'})
@@ -118,26 +246,35 @@ class SocketClient:
             request['parameters'] = parameters
         return self.send_request(request)
 
+def write_raw_stdout(text: str):
+    """Write text to stdout as UTF-8 in one write, bypassing the text layer"""
+    buffer = getattr(sys.stdout, 'buffer', None)
+    if buffer is None:
+        sys.stdout.write(text)
+        return
+    sys.stdout.flush()  # Keep ordering with anything already printed
+    buffer.write(text.encode('utf-8'))
+    buffer.flush()
+
+# Harmless commands the test action may run, in order of preference
+SAFE_TEST_COMMANDS = ('echo', 'date', 'uptime', 'ping')
+
 def format_table(headers: List[str], rows: List[List[str]]) -> str:
     """Format data as a simple ASCII table"""
-    # Calculate column widths
-    col_widths = [len(h) for h in headers]
-    for row in rows:
-        for i, cell in enumerate(row):
-            col_widths[i] = max(col_widths[i], len(str(cell)))
+    # Stringify each cell once, then size columns from the transposed rows
+    str_rows = [list(map(str, row)) for row in rows]
+    col_widths = [max(map(len, col)) for col in zip_longest(headers, *str_rows, fillvalue='')]
     
     # Build table
     lines = []
     
     # Header
-    header_line = " │ ".join(h.ljust(col_widths[i]) for i, h in enumerate(headers))
+    header_line = " │ ".join(h.ljust(w) for h, w in zip(headers, col_widths))
     lines.append(header_line)
     lines.append("─┼─".join("─" * w for w in col_widths))
     
     # Rows
-    for row in rows:
-        row_line = " │ ".join(str(cell).ljust(col_widths[i]) for i, cell in enumerate(row))
-        lines.append(row_line)
+    lines.extend(" │ ".join(cell.ljust(w) for cell, w in zip(row, col_widths)) for row in str_rows)
     
     return "\n".join(lines)
 
@@ -197,21 +334,36 @@ def print_server_info(info: Dict[str, Any], detailed: bool = True):
             table = format_table(["Command", "Description"], cmd_list)
             print(table)
 
+# Characters a JSON document can start with (json.loads also accepts
+# leading whitespace, NaN and Infinity); anything else is a plain string
+_JSON_FIRST_CHARS = frozenset('{["-0123456789tfnNI \t\n\r')
+_TRUE_STRINGS = frozenset(('true', 'yes', 'on', '1'))
+_FALSE_STRINGS = frozenset(('false', 'no', 'off', '0'))
+
 def parse_parameter_value(value_str: str) -> Any:
     """Parse parameter value, trying to infer the type"""
-    # Try to parse as JSON first (handles numbers, booleans, arrays, objects)
-    try:
-        return json.loads(value_str)
-    except json.JSONDecodeError:
-        # Check for boolean strings
-        if value_str.lower() in ('true', 'yes', 'on', '1'):
-            return True
-        elif value_str.lower() in ('false', 'no', 'off', '0'):
-            return False
-        # Default to string
-        return value_str
+    # Try to parse as JSON first (handles numbers, booleans, arrays, objects),
+    # skipping the parse attempt for values that cannot be JSON
+    if value_str and value_str[0] in _JSON_FIRST_CHARS:
+        try:
+            return json.loads(value_str)
+        except json.JSONDecodeError:
+            pass
+    # Check for boolean strings
+    lowered = value_str.lower()
+    if lowered in _TRUE_STRINGS:
+        return True
+    elif lowered in _FALSE_STRINGS:
+        return False
+    # Default to string
+    return value_str
 
-def main():
+@lru_cache(maxsize=None)
+def build_parser() -> 'argparse.ArgumentParser':
+    """Build the CLI argument parser (constructed once per process)"""
+    # Imported here: argparse pulls in re and gettext, which bare actions never need
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description='Unix Socket Bridge CLI Client',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -240,6 +392,8 @@ Examples:
     ping_parser = subparsers.add_parser('ping', help='Ping the server')
     ping_parser.add_argument('--json', action='store_true', help='Output as JSON')
     ping_parser.add_argument('--count', '-c', type=int, default=1, help='Number of pings to send')
+    ping_parser.add_argument('--interval', '-i', type=float, default=1.0,
+                             help='Seconds to wait between pings (0 for back-to-back latency runs)')
     
     # Execute command
     exec_parser = subparsers.add_parser('exec', help='Execute a command')
@@ -260,18 +414,50 @@ Examples:
     test_parser = subparsers.add_parser('test', help='Run connectivity and functionality tests')
     test_parser.add_argument('--json', action='store_true', help='Output as JSON')
     
-    args = parser.parse_args()
+    return parser
+
+# Defaults for actions invoked without options, e.g. `cli-client.py /tmp/x.sock ping`
+_BARE_ACTION_DEFAULTS = {
+    'introspect': {'json': False, 'simple': False},
+    'ping': {'json': False, 'count': 1, 'interval': 1.0},
+    'list': {'json': False},
+    'test': {'json': False},
+}
+
+def parse_args(argv: Optional[List[str]] = None):
+    """Parse CLI arguments, skipping parser construction for bare actions"""
+    if argv is None:
+        argv = sys.argv[1:]
+    
+    if len(argv) == 2 and not argv[0].startswith('-') and argv[1] in _BARE_ACTION_DEFAULTS:
+        return SimpleNamespace(
+            socket_path=argv[0],
+            timeout=10,
+            verbose=False,
+            action=argv[1],
+            **_BARE_ACTION_DEFAULTS[argv[1]]
+        )
+    
+    return build_parser().parse_args(argv)
+
+def main():
+    args = parse_args()
     
     if not args.action:
-        parser.print_help()
+        build_parser().print_help()
         sys.exit(1)
     
-    client = SocketClient(args.socket_path, args.timeout, args.verbose)
-    
+    # Actions that issue several requests reuse one connection
+    keep_alive = args.action == 'test' or (args.action == 'ping' and args.count > 1)
+    with SocketClient(args.socket_path, args.timeout, args.verbose, keep_alive=keep_alive) as client:
+        run_action(client, args)
+
+def run_action(client: SocketClient, args):
+    """Run the requested CLI action against the server"""
     if args.action == 'introspect':
         info = client.introspect()
         if args.json:
-            print(json.dumps(info, indent=2))
+            print(dumps_pretty(info))
         else:
             print_server_info(info, detailed=not args.simple)
     
@@ -280,9 +466,9 @@ Examples:
             # Multiple pings with timing
             results = []
             for i in range(args.count):
-                start_time = time.time()
+                start_time = time.perf_counter_ns()
                 response = client.ping()
-                elapsed = (time.time() - start_time) * 1000  # ms
+                elapsed = (time.perf_counter_ns() - start_time) / 1e6  # ms
                 
                 if not args.json:
                     if response.get('success'):
@@ -297,11 +483,11 @@ Examples:
                     'response': response
                 })
                 
-                if i < args.count - 1:
-                    time.sleep(1)
+                if args.interval > 0 and i < args.count - 1:
+                    time.sleep(args.interval)
             
             if args.json:
-                print(json.dumps(results, indent=2))
+                print(dumps_pretty(results))
             elif any(r['success'] for r in results):
                 avg_time = sum(r['time_ms'] for r in results if r['success']) / sum(1 for r in results if r['success'])
                 success_rate = sum(1 for r in results if r['success']) / len(results) * 100
@@ -310,7 +496,7 @@ Examples:
             # Single ping
             response = client.ping()
             if args.json:
-                print(json.dumps(response, indent=2))
+                print(dumps_pretty(response))
             else:
                 if response.get('success'):
                     print("✅ Server is responding")
@@ -321,17 +507,17 @@ Examples:
                     sys.exit(1)
     
     elif args.action == 'list':
-        info = client.introspect()
+        info = client.list_commands()
         if info.get('success'):
-            commands = list(info['server_info'].get('commands', {}).keys())
+            commands = info.get('commands', [])
             if args.json:
-                print(json.dumps(commands, indent=2))
+                print(dumps_pretty(commands))
             else:
                 for cmd_name in sorted(commands):
                     print(cmd_name)
         else:
             if args.json:
-                print(json.dumps(info, indent=2))
+                print(dumps_pretty(info))
             else:
                 print(f"❌ Error: {info.get('error', 'Unknown error')}", file=sys.stderr)
             sys.exit(1)
@@ -355,13 +541,13 @@ Examples:
         response = client.execute_command(args.command, parameters if parameters else None)
         
         if args.json:
-            print(json.dumps(response, indent=2))
+            print(dumps_pretty(response))
         elif args.output_only:
             # Only print stdout, useful for scripting
             if response.get('success'):
                 output = response.get('stdout', '')
                 if output:
-                    print(output, end='')
+                    write_raw_stdout(output)
             else:
                 print(response.get('stderr', response.get('error', '')), file=sys.stderr)
                 sys.exit(1)
@@ -406,9 +592,9 @@ Examples:
                 print(f"{status} Socket is accessible: {test_result['success']}")
             
             # Test 3: Ping
-            start_time = time.time()
+            start_time = time.perf_counter_ns()
             ping_response = client.ping()
-            ping_time = (time.time() - start_time) * 1000
+            ping_time = (time.perf_counter_ns() - start_time) / 1e6
             test_result = {
                 'test': 'Ping response', 
                 'success': ping_response.get('success', False),
@@ -436,12 +622,8 @@ Examples:
             # Test 5: Execute a simple command if available
             if intro_response.get('success'):
                 commands = intro_response.get('server_info', {}).get('commands', {})
-                # Look for a safe test command
-                test_cmd = None
-                for cmd in ['echo', 'date', 'uptime', 'ping']:
-                    if cmd in commands:
-                        test_cmd = cmd
-                        break
+                # Look for a safe test command, in order of preference
+                test_cmd = next((cmd for cmd in SAFE_TEST_COMMANDS if cmd in commands), None)
                 
                 if test_cmd:
                     test_exec = client.execute_command(test_cmd, {'message': 'test'} if test_cmd == 'echo' else None)
@@ -455,14 +637,14 @@ Examples:
                         print(f"{status} Command execution works: {test_result['success']}")
         
         if args.json:
-            print(json.dumps({
+            print(dumps_pretty({
                 'socket_path': args.socket_path,
                 'tests': tests, 
                 'success': all(t['success'] for t in tests),
                 'passed': sum(1 for t in tests if t['success']),
                 'failed': sum(1 for t in tests if not t['success']),
                 'total': len(tests)
-            }, indent=2))
+            }))
         else:
             passed = sum(1 for t in tests if t['success'])
             print(f"\n📊 Test Summary: {passed}/{len(tests)} tests passed")
@@ -134,7 +134,8 @@ def main():
             sys.exit(1)
         
         computed_hash = hash_token(token)
-        if computed_hash == args.validate:
+        # Constant-time comparison so the check doesn't leak how much of the hash matched
+        if secrets.compare_digest(computed_hash.encode('utf-8'), args.validate.encode('utf-8')):
             print("✅ Token is valid for the provided hash")
             sys.exit(0)
         else:
@@ -4,37 +4,127 @@ Generic Unix Socket Server
 Configurable socket server that can execute predefined commands based on JSON configuration.
 """
 
+import asyncio
 import socket
 import subprocess
 import json
+import codecs
 import os
 import argparse
 import logging
 import signal
+import struct
 import sys
-from typing import Dict, Any, List, Tuple
+from typing import Callable, Dict, Any, List, Optional, Tuple
 import re
-from collections import defaultdict
-from time import time
+import select
+import selectors
 import threading
+from array import array
+from collections import defaultdict, deque
+from itertools import count
+from time import monotonic, monotonic_ns, sleep, time
+from concurrent.futures import ThreadPoolExecutor
 import secrets
 import hashlib
+import hmac
 import pwd
 
+try:
+    import orjson  # Optional: faster request parsing and response encoding
+except ImportError:
+    orjson = None
+
+try:
+    import uvloop  # Optional: faster event loop for worker_model 'asyncio'
+except ImportError:
+    uvloop = None
+
+# orjson parses integers outside the 64-bit range as floats, losing precision.
+# Any payload with a run of 20+ digits (which may be such an integer) goes to json
+_LONG_DIGITS = re.compile(r'[0-9]{20}')
+_LONG_DIGITS_BYTES = re.compile(rb'[0-9]{20}')
+
+def loads_json(data):
+    """Parse JSON (str or bytes), using orjson when installed"""
+    if orjson is not None:
+        long_digits = _LONG_DIGITS if isinstance(data, str) else _LONG_DIGITS_BYTES
+        if long_digits.search(data) is None:
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass  # Let json report the error, or accept what orjson can't (e.g. NaN)
+    return json.loads(data)
+
+# Responses carry no whitespace between tokens, matching orjson's output
+_COMPACT_ENCODER = json.JSONEncoder(separators=(',', ':'))
+
+def dumps_json(obj: Any) -> bytes:
+    """Serialize an object as compact JSON bytes, using orjson when installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # Non-string keys, >64-bit ints etc. that only json handles
+    return _COMPACT_ENCODER.encode(obj).encode()
+
+# Applied to string parameters that define neither 'pattern' nor 'enum'
+# (unless strict_parameter_validation is disabled): alphanumeric + basic safe punctuation
+DEFAULT_PARAMETER_PATTERN = re.compile(r'^[a-zA-Z0-9._\-\s]+$')
+
+# What a client is identified by for rate limiting: the peer's user, the peer's
+# process, or the individual connection
+RATE_LIMIT_KEYS = ('uid', 'pid', 'connection')
+
+# Built-in commands answered by the server itself
+SPECIAL_COMMANDS = frozenset(('__introspect__', '__ping__', '__list__', '__stats__'))
+
+# Encoded __ping__ response up to the timestamp value
+PONG_PAYLOAD_PREFIX = b'{"success":true,"message":"pong","timestamp":'
+
+# Request latency histogram size; bucket n counts requests under 2**(n + 10) ns
+LATENCY_BUCKETS = 64
+
+# How connections are spread: threads in one process, pre-forked processes,
+# or coroutines on one asyncio event loop
+WORKER_MODELS = ('thread', 'process', 'asyncio')
+
+# struct ucred as returned by SO_PEERCRED: pid, uid, gid
+PEERCRED_STRUCT = struct.Struct('3i')
+PEERCRED_SIZE = PEERCRED_STRUCT.size
+
+# Frame header for persistent commands and length-prefixed client requests:
+# payload length as 4-byte big-endian
+FRAME_HEADER = struct.Struct('>I')
+
+# Bytes asked for per read while receiving a request
+REQUEST_CHUNK_SIZE = 65536
+
+# Python types accepted for each parameter 'type' in the config
+PARAMETER_TYPES = {
+    'string': str,
+    'number': (int, float),
+    'boolean': bool,
+}
+
 class AuthRateLimiter:
     """Rate limiter for authentication attempts"""
+    # Checks between sweeps of every client's entries
+    cleanup_interval = 256
     
     def __init__(self, max_attempts: int = 5, window_seconds: int = 60, block_duration: int = 60):
         self.max_attempts = max_attempts
         self.window_seconds = window_seconds
         self.block_duration = block_duration
-        self.failed_attempts = defaultdict(list)  # client_id -> [timestamps]
+        # client_id -> monotonic timestamps of the last max_attempts failures, oldest first
+        self.failed_attempts = defaultdict(lambda: deque(maxlen=self.max_attempts))
         self.blocked_clients = defaultdict(float)  # client_id -> block_until_timestamp
+        self.checks = count(1)
         self.logger = logging.getLogger(__name__)
         
     def check_rate_limit(self, client_id: str) -> bool:
         """Check if client is allowed to attempt authentication"""
-        now = time()
+        now = monotonic()
         
         # Check if client is currently blocked
         if client_id in self.blocked_clients:
@@ -46,42 +136,51 @@ class AuthRateLimiter:
                 if client_id in self.failed_attempts:
                     del self.failed_attempts[client_id]
         
-        # Cleanup old entries and check current attempt count
-        self.cleanup_old_entries()
+        # Other clients' entries are only swept now and then, this one's every time
+        if next(self.checks) % self.cleanup_interval == 0:
+            self.cleanup_old_entries()
         
-        return len(self.failed_attempts[client_id]) < self.max_attempts
+        # Only the oldest of the last max_attempts failures can keep the client out
+        attempts = self.failed_attempts.get(client_id)
+        return (not attempts or len(attempts) < self.max_attempts
+                or attempts[0] <= now - self.window_seconds)
+    
+    def expire_attempts(self, attempts: deque, now: float):
+        """Drop failures that fell out of the window; timestamps are in order"""
+        cutoff = now - self.window_seconds
+        while attempts and attempts[0] <= cutoff:
+            attempts.popleft()
     
     def record_failure(self, client_id: str):
         """Record a failed authentication attempt"""
-        now = time()
-        self.failed_attempts[client_id].append(now)
+        now = monotonic()
+        attempts = self.failed_attempts[client_id]
+        self.expire_attempts(attempts, now)
+        attempts.append(now)
         
-        attempt_count = len(self.failed_attempts[client_id])
-        self.logger.warning(f"Failed authentication attempt from {client_id} ({attempt_count}/{self.max_attempts})")
+        attempt_count = len(attempts)
+        self.logger.warning("Failed authentication attempt from %s (%d/%d)", client_id, attempt_count, self.max_attempts)
         
         # Block client if max attempts reached
         if attempt_count >= self.max_attempts:
             self.blocked_clients[client_id] = now + self.block_duration
-            self.logger.error(f"Client {client_id} blocked due to too many failed auth attempts")
+            self.logger.error("Client %s blocked due to too many failed auth attempts", client_id)
     
     def record_success(self, client_id: str):
         """Clear failure counter on successful authentication"""
         if client_id in self.failed_attempts:
             del self.failed_attempts[client_id]
         # Note: Don't clear blocked_clients here - let blocks expire naturally
-        self.logger.info(f"Successful authentication from {client_id}")
+        self.logger.info("Successful authentication from %s", client_id)
     
     def cleanup_old_entries(self):
         """Remove old entries to prevent memory growth"""
-        now = time()
+        now = monotonic()
         
         # Clean up failed attempts outside the window
-        for client_id in list(self.failed_attempts.keys()):
-            self.failed_attempts[client_id] = [
-                t for t in self.failed_attempts[client_id]
-                if now - t < self.window_seconds
-            ]
-            if not self.failed_attempts[client_id]:
+        for client_id, attempts in list(self.failed_attempts.items()):
+            self.expire_attempts(attempts, now)
+            if not attempts:
                 del self.failed_attempts[client_id]
         
         # Clean up expired blocks
@@ -92,24 +191,355 @@ class AuthRateLimiter:
         
         for client_id in expired_blocks:
             del self.blocked_clients[client_id]
-            if expired_blocks:
-                self.logger.debug(f"Cleaned up {len(expired_blocks)} expired rate limit entries")
+        if expired_blocks:
+            self.logger.debug(f"Cleaned up {len(expired_blocks)} expired rate limit entries")
+
+def allowed_dir_prefixes(allowed_dirs: List[str]) -> Tuple[str, ...]:
+    """Normalize allowed executable dirs into prefixes ending in '/' for str.startswith
+    
+    The trailing separator keeps '/usr/bin' from also allowing '/usr/bin2/...'.
+    """
+    return tuple(os.path.join(os.path.normpath(d), '') for d in allowed_dirs)
+
+def run_capped(args: List[str], limit: int, timeout: float, env: Dict[str, str] = None,
+               cwd: str = None) -> subprocess.CompletedProcess:
+    """Run a command like subprocess.run(capture_output=True), keeping at most limit bytes per stream
+    
+    Output past the limit is read and discarded so the command still runs to
+    completion and reports its real return code. stdout and stderr are the
+    bytearrays they were captured into. Raises subprocess.TimeoutExpired
+    after killing the command if it doesn't finish in time.
+    """
+    # No preexec_fn, so CPython spawns the child with vfork() instead of
+    # copying the server's page tables with fork()
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=cwd) as process:
+        try:
+            deadline = monotonic() + timeout
+            stdout, stderr = bytearray(), bytearray()
+            captured = {process.stdout.fileno(): stdout, process.stderr.fileno(): stderr}
+            
+            with selectors.DefaultSelector() as selector:
+                for fd in captured:
+                    selector.register(fd, selectors.EVENT_READ)
+                
+                while selector.get_map():
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        raise subprocess.TimeoutExpired(args, timeout)
+                    for key, _ in selector.select(remaining):
+                        chunk = os.read(key.fd, 65536)
+                        if not chunk:
+                            selector.unregister(key.fd)
+                            continue
+                        buffer = captured[key.fd]
+                        if len(buffer) < limit:
+                            buffer += chunk[:limit - len(buffer)]
+            
+            returncode = process.wait(timeout=max(deadline - monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise subprocess.TimeoutExpired(args, timeout)
+    
+    return subprocess.CompletedProcess(args, returncode, stdout, stderr)
+
+async def run_capped_async(args: List[str], limit: int, timeout: float, env: Dict[str, str] = None,
+                           cwd: str = None) -> subprocess.CompletedProcess:
+    """asyncio counterpart of run_capped: waits for the command without holding a thread"""
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=cwd
+    )
+    try:
+        stdout, stderr, returncode = await asyncio.wait_for(
+            asyncio.gather(_read_capped(process.stdout, limit), _read_capped(process.stderr, limit), process.wait()),
+            timeout
+        )
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired(args, timeout)
+    
+    return subprocess.CompletedProcess(args, returncode, stdout, stderr)
+
+async def _read_capped(stream: asyncio.StreamReader, limit: int) -> bytearray:
+    """Read a stream to EOF, keeping at most limit bytes"""
+    data = bytearray()
+    while chunk := await stream.read(65536):
+        if len(data) < limit:
+            data += chunk[:limit - len(data)]
+    return data
+
+class RequestBuffer:
+    """Collects a request's bytes until they form a complete JSON object
+    
+    A request is either bare JSON, complete once it parses, or a frame: a
+    4-byte big-endian length followed by that many bytes of JSON, parsed once.
+    Bare requests start with '{' (or whitespace), so a leading zero byte, the
+    high byte of any length up to 16MB, marks a frame.
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # Decode incrementally so each byte is decoded once and invalid
+        # UTF-8 is rejected as soon as it arrives
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.parts = []
+        self.size = 0
+        self.request = None
+        # Length-prefixed requests: decided by the first byte. Once the
+        # header is in, frame is allocated at full size and filled in place
+        self.framed = False
+        self.header = bytearray()
+        self.frame = None
+        self.frame_view = None
+        self.frame_received = 0
+    
+    def feed(self, chunk: bytes) -> bool:
+        """Add a chunk; returns True once the request is complete"""
+        if not self.size and chunk[:1] == b'\0':
+            self.framed = True
+        self.size += len(chunk)
+        if self.framed:
+            return self.feed_frame(chunk)
+        
+        # Check size limit
+        if self.size > self.max_size:
+            raise ValueError(f"Request too large (max {self.max_size} bytes)")
+        
+        try:
+            self.parts.append(self.decoder.decode(chunk))
+        except UnicodeDecodeError:
+            raise ValueError("Invalid UTF-8 in request")
+        
+        # Requests are JSON objects, so the message can only be complete once
+        # a chunk ends with '}' (plus any trailing whitespace, e.g. a newline
+        # from echo | nc); skip parsing until then
+        if not chunk.rstrip().endswith(b'}'):
+            return False
+        try:
+            self.request = loads_json(''.join(self.parts))
+            return True  # Valid JSON received, message is complete
+        except json.JSONDecodeError:
+            return False  # Keep reading
+    
+    def feed_frame(self, chunk: bytes) -> bool:
+        """Add a chunk of a length-prefixed request; returns True once it is all read"""
+        if self.frame is None:
+            self.header += chunk
+            if len(self.header) < FRAME_HEADER.size:
+                return False
+            (length,) = FRAME_HEADER.unpack_from(self.header)
+            if length > self.max_size:
+                raise ValueError(f"Request too large (max {self.max_size} bytes)")
+            self.frame = bytearray(length)
+            self.frame_view = memoryview(self.frame)
+            chunk = self.header[FRAME_HEADER.size:]
+        
+        end = self.frame_received + len(chunk)
+        if end > len(self.frame):
+            raise ValueError("Request longer than its length prefix")
+        self.frame_view[self.frame_received:end] = chunk
+        self.frame_received = end
+        return self.frame_complete()
+    
+    def recv_frame_into(self, sock: socket.socket) -> bool:
+        """Receive the rest of a frame straight into its buffer; returns True once
+        the request is complete or the client stopped sending"""
+        received = sock.recv_into(self.frame_view[self.frame_received:])
+        self.size += received
+        self.frame_received += received
+        return not received or self.frame_complete()
+    
+    def frame_complete(self) -> bool:
+        """Decode and parse the frame once all of it has arrived"""
+        if self.frame_received < len(self.frame):
+            return False
+        
+        try:
+            self.parts = [self.frame.decode('utf-8')]
+        except UnicodeDecodeError:
+            raise ValueError("Invalid UTF-8 in request")
+        try:
+            self.request = loads_json(self.parts[0])
+        except json.JSONDecodeError:
+            pass  # Reported when the caller parses the text
+        return True
+    
+    def finish(self) -> Tuple[str, Any]:
+        """Returns (text, parsed JSON or None if never parsed)"""
+        if not self.size:
+            raise ValueError("Empty request")
+        if self.framed and not self.parts:
+            raise ValueError("Incomplete request")
+        
+        try:
+            self.parts.append(self.decoder.decode(b'', final=True))
+        except UnicodeDecodeError:
+            raise ValueError("Invalid UTF-8 in request")
+        
+        return ''.join(self.parts), self.request
+
+class PersistentCommand:
+    """A long-lived command process that serves requests over stdin/stdout
+    
+    Each request and reply is a length-prefixed frame: a 4-byte big-endian
+    payload length followed by the payload. Requests are JSON objects with
+    'command' and 'parameters'; replies are JSON objects with 'returncode'
+    (default 0), 'stdout' and 'stderr' (default "").
+    """
+    
+    def __init__(self, executable: List[str], env: Dict[str, str], cwd: str):
+        self.executable = executable
+        self.env = env
+        self.cwd = cwd
+        self.process = None
+        # Requests arrive on worker threads but the process serves one at a time
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+    
+    def call(self, payload: bytes, timeout: float) -> subprocess.CompletedProcess:
+        """Send one request frame and return the reply as a finished process result"""
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.process = subprocess.Popen(
+                    self.executable,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    env=self.env,
+                    cwd=self.cwd
+                )
+                # Writes wait in select so a process that stops reading can't block past the timeout
+                os.set_blocking(self.process.stdin.fileno(), False)
+                if self.logger.isEnabledFor(logging.INFO):
+                    self.logger.info("Started persistent command: %s (pid %d)", ' '.join(self.executable), self.process.pid)
+            
+            try:
+                deadline = monotonic() + timeout
+                self._write_all(FRAME_HEADER.pack(len(payload)) + payload, deadline, timeout)
+                (length,) = FRAME_HEADER.unpack(self._read_exact(FRAME_HEADER.size, deadline, timeout))
+                return self.parse_reply(self._read_exact(length, deadline, timeout))
+            except Exception:
+                # A process that timed out or broke the protocol can't be trusted
+                # with the next request; respawn it on next use
+                self.close()
+                raise
+    
+    def parse_reply(self, reply: bytes) -> subprocess.CompletedProcess:
+        """Unpack a reply envelope into returncode and UTF-8 encoded stdout/stderr"""
+        try:
+            envelope = loads_json(reply)
+        except ValueError:  # Not JSON, or not UTF-8
+            envelope = None
+        if not isinstance(envelope, dict):
+            raise ValueError("Persistent command reply is not a JSON object")
+        
+        returncode = envelope.get('returncode', 0)
+        stdout = envelope.get('stdout', '')
+        stderr = envelope.get('stderr', '')
+        if type(returncode) is not int or not isinstance(stdout, str) or not isinstance(stderr, str):
+            raise ValueError("Persistent command reply has invalid returncode, stdout or stderr")
+        
+        return subprocess.CompletedProcess(self.executable, returncode,
+                                           stdout.encode('utf-8', 'replace'), stderr.encode('utf-8', 'replace'))
+    
+    def _write_all(self, data: bytes, deadline: float, timeout: float):
+        """Write all of data to the process's stdin before the deadline"""
+        fd = self.process.stdin.fileno()
+        view = memoryview(data)
+        while view:
+            remaining = deadline - monotonic()
+            if remaining <= 0 or not select.select([], [fd], [], remaining)[1]:
+                raise subprocess.TimeoutExpired(self.executable, timeout)
+            try:
+                view = view[os.write(fd, view):]
+            except BlockingIOError:
+                pass  # Pipe filled up between select and write
+    
+    def _read_exact(self, size: int, deadline: float, timeout: float) -> bytes:
+        """Read exactly size bytes from the process's stdout before the deadline"""
+        fd = self.process.stdout.fileno()
+        data = bytearray()
+        while len(data) < size:
+            remaining = deadline - monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise subprocess.TimeoutExpired(self.executable, timeout)
+            chunk = os.read(fd, size - len(data))
+            if not chunk:
+                raise EOFError(f"Persistent command exited (code {self.process.poll()})")
+            data += chunk
+        return bytes(data)
+    
+    def close(self):
+        """Stop the process if it is running"""
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        try:
+            process.kill()
+            process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        for pipe in (process.stdin, process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
 
 class ConfigurableSocketServer:
+    # Rate limit checks between sweeps of idle clients
+    rate_limit_sweep_interval = 256
+    # A worker process that exits within worker_min_uptime seconds of starting
+    # is restarted after a doubling delay, up to worker_max_restart_delay
+    worker_min_uptime = 1.0
+    worker_max_restart_delay = 5.0
+    
     def __init__(self, config_path: str):
         self.config = self.load_config(config_path)
         self.socket_path = self.config['socket_path']
         self.running = False
         self.server_socket = None
+        self.executor = None
         
-        # Rate limiting
-        self.request_times = defaultdict(list)
+        # Rate limiting: per-client monotonic timestamps of the last
+        # rate_limit['requests'] requests, oldest first. No deque maxlen, since
+        # rate_limit may change after startup; check_rate_limit trims them
+        self.request_times = defaultdict(deque)
+        self.rate_limit_checks = count(1)
         self.rate_limit = self.config.get('rate_limit', {'requests': 30, 'window': 60})
+        self.rate_limit_key = self.config.get('rate_limit_key', 'connection')
         
         # Size limits
         self.max_request_size = self.config.get('max_request_size', 1048576)  # 1MB default
         self.max_output_size = self.config.get('max_output_size', 100000)  # 100KB default
         
+        # Kernel send buffer per connection, large enough for a full response
+        self.send_buffer_size = self.config.get('send_buffer_size', 1048576)  # 1MB default
+        
+        # How long a keep-alive connection may sit idle between requests
+        self.keep_alive_timeout = self.config.get('keep_alive_timeout', 5.0)
+        
+        # A short backlog makes bursts of connections fail with EAGAIN while
+        # the server is busy; by default let the kernel queue as many as it allows
+        self.listen_backlog = self.config.get('listen_backlog', socket.SOMAXCONN)
+        
+        # Upper bound on concurrently handled connections when threading is enabled
+        self.worker_threads = self.config.get('worker_threads', min(32, (os.cpu_count() or 1) * 4))
+        # Connections allowed to wait for a free worker thread before new ones are turned away
+        self.max_queued_connections = self.config.get('max_queued_connections', 4 * self.worker_threads)
+        self.connection_slots = threading.Semaphore(self.worker_threads + self.max_queued_connections)
+        
+        # 'process' pre-forks worker_processes processes that share the listening socket
+        self.worker_model = self.config.get('worker_model', 'thread')
+        self.worker_processes = self.config.get('worker_processes', os.cpu_count() or 1)
+        self.worker_pids = {}  # pid -> monotonic() start time
+        self.is_worker = False
+        
+        # An open keep-alive connection would hold the only accept loop in serial
+        # mode, so connections are only kept open when they're served concurrently
+        self.keep_alive_enabled = (self.worker_model in ('process', 'asyncio')
+                                   or self.config.get('enable_threading', False))
+        
         # Authentication setup
         self.auth_enabled = self._load_auth_config()
         self.auth_token_hash = None
@@ -122,6 +552,8 @@ class ConfigurableSocketServer:
                 logging.error("Set AUTH_TOKEN_HASH environment variable or 'auth_token_hash' in config file")
                 logging.error("Use generate-token-hash.py to create secure hashed tokens")
                 sys.exit(1)
+        # Decoded once so each request is a constant-time compare of raw digests
+        self.auth_token_digest = self.token_hash_bytes(self.auth_token_hash) if self.auth_token_hash else None
         
         # Authentication rate limiting
         auth_max_attempts = int(os.getenv('AUTH_MAX_ATTEMPTS', '5'))
@@ -141,6 +573,40 @@ class ConfigurableSocketServer:
             self.logger.info("Auth enabled, using SHA-256 hashed token authentication")
         else:
             self.logger.info("Auth disabled, running in development mode")
+        
+        # Parameter validation compiled once per command instead of per request
+        self.command_validators = {
+            cmd_name: self.build_command_validator(cmd_config)
+            for cmd_name, cmd_config in self.config['commands'].items()
+        }
+        
+        # Argument list construction, likewise prepared once per command
+        self.argv_builders = {
+            cmd_name: self.build_argv_builder(cmd_config)
+            for cmd_name, cmd_config in self.config['commands'].items()
+        }
+        
+        # Request latency histogram, see record_latency; __stats__ exposes it
+        # to local clients, so only when enabled
+        self.latency_histogram = array('Q', bytes(8 * LATENCY_BUCKETS))
+        self.started_at = time()
+        self.stats_enabled = self.config.get('enable_stats', False)
+        
+        # Processes for commands with 'persistent': true, started on first use
+        self.persistent_commands = {}
+        self.persistent_commands_lock = threading.Lock()
+        
+        # The introspection and command list responses are static for the server's lifetime
+        self.introspection_response = self.build_introspection_response()
+        self.introspection_payload = self.encode_response(self.introspection_response)
+        self.list_payload = self.encode_response(self.execute_command({'command': '__list__'}))
+        # Sent to every request over the rate limit, so encoded once too
+        self.rate_limit_payload = self.encode_response({
+            'success': False,
+            'error': 'Rate limit exceeded',
+            'retry_after': self.rate_limit['window']
+        })
+        self.busy_payload = self.encode_response({'success': False, 'error': 'Server busy, try again later'})
     
     def _load_auth_config(self) -> bool:
         """Load authentication configuration from config file or environment variables"""
@@ -174,10 +640,19 @@ class ConfigurableSocketServer:
         """Generate SHA-256 hash of a token for secure storage"""
         return hashlib.sha256(token.encode('utf-8')).hexdigest()
     
+    @staticmethod
+    def token_hash_bytes(token_hash: str) -> bytes:
+        """Raw bytes of a hex token hash, so comparisons ignore hex case"""
+        try:
+            return bytes.fromhex(token_hash)
+        except ValueError:
+            return token_hash.encode('utf-8')  # Not hex, compared as given
+    
     @staticmethod
     def verify_token_hash(token: str, token_hash: str) -> bool:
         """Verify a token against its stored hash"""
-        return hashlib.sha256(token.encode('utf-8')).hexdigest() == token_hash
+        return hmac.compare_digest(hashlib.sha256(token.encode('utf-8')).digest(),
+                                   ConfigurableSocketServer.token_hash_bytes(token_hash))
     
     def validate_auth(self, request: Dict[str, Any], client_id: str) -> tuple[bool, str]:
         """Validate authentication token from request"""
@@ -194,9 +669,9 @@ class ConfigurableSocketServer:
         
         # Check if hashed token is present and valid
         token_valid = False
-        if auth_token_hash:
-            # Client sent hashed token - compare directly with stored hash
-            token_valid = auth_token_hash == self.auth_token_hash
+        if auth_token_hash and isinstance(auth_token_hash, str):
+            # Client sent hashed token - compare with the stored hash in constant time
+            token_valid = hmac.compare_digest(self.token_hash_bytes(auth_token_hash), self.auth_token_digest)
         
         if not token_valid:
             self.auth_rate_limiter.record_failure(client_id)
@@ -206,12 +681,7 @@ class ConfigurableSocketServer:
             else:
                 return False, "auth_failed"
         
-        # Even with correct token, check if client is currently blocked
-        # This is important for consistent rate limiting behavior
-        if not self.auth_rate_limiter.check_rate_limit(client_id):
-            return False, "rate_limited"
-        
-        # Successful authentication - only record if not blocked
+        # Successful authentication; a blocked client was already turned away above
         self.auth_rate_limiter.record_success(client_id)
         return True, ""
         
@@ -232,12 +702,36 @@ class ConfigurableSocketServer:
             
             # Validate commands
             for cmd_name, cmd_config in config['commands'].items():
+                # Built-ins are answered before command lookup and would shadow the command
+                if cmd_name in SPECIAL_COMMANDS:
+                    raise ValueError(f"Command name '{cmd_name}' is reserved for a built-in command")
+                
                 if 'executable' not in cmd_config:
                     raise ValueError(f"Command '{cmd_name}' missing 'executable'")
                 
                 # Validate executable path
                 if not self.validate_executable_path(cmd_config['executable'], config):
                     raise ValueError(f"Command '{cmd_name}' has invalid executable path")
+                
+                # Reject unusable patterns at startup instead of on every request
+                for param_name, param_config in cmd_config.get('parameters', {}).items():
+                    if 'pattern' in param_config:
+                        try:
+                            re.compile(param_config['pattern'])
+                        except re.error as e:
+                            raise ValueError(f"Command '{cmd_name}' parameter '{param_name}' has invalid pattern: {e}")
+                
+                if cmd_config.get('persistent', False) and cmd_config.get('protocol', 'length_prefixed') != 'length_prefixed':
+                    raise ValueError(f"Command '{cmd_name}' has unsupported protocol: {cmd_config['protocol']}")
+            
+            # Validate worker model
+            if config.get('worker_model', 'thread') not in WORKER_MODELS:
+                raise ValueError(f"Invalid worker_model '{config['worker_model']}', expected one of: {', '.join(WORKER_MODELS)}")
+            
+            # Validate rate limit key
+            rate_limit_key = config.get('rate_limit_key', 'connection')
+            if rate_limit_key not in RATE_LIMIT_KEYS:
+                raise ValueError(f"Invalid rate_limit_key '{rate_limit_key}', expected one of: {', '.join(RATE_LIMIT_KEYS)}")
                     
             return config
             
@@ -310,22 +804,47 @@ class ConfigurableSocketServer:
         binary = executable[0]
         
         # Allow only specific directories for security
-        allowed_dirs = config.get('allowed_executable_dirs', [])
+        allowed_prefixes = allowed_dir_prefixes(config.get('allowed_executable_dirs', []))
         
         # Check if it's an absolute path
         if os.path.isabs(binary):
-            # Must be in allowed directories
-            if not any(binary.startswith(d) for d in allowed_dirs):
+            # Must be in allowed directories; normalized so '..' can't climb out
+            binary = os.path.normpath(binary)
+            if not binary.startswith(allowed_prefixes):
                 return False
             return os.path.exists(binary) and os.access(binary, os.X_OK)
         else:
             # Relative path - check if it exists in allowed dirs
-            for dir_path in allowed_dirs:
-                full_path = os.path.join(dir_path, binary)
-                if os.path.exists(full_path) and os.access(full_path, os.X_OK):
+            for prefix in allowed_prefixes:
+                full_path = os.path.normpath(os.path.join(prefix, binary))
+                if (full_path.startswith(prefix) and os.path.exists(full_path)
+                        and os.access(full_path, os.X_OK)):
                     return True
             return False
             
+    def resolve_command_executable(self, cmd_config: Dict[str, Any]) -> List[str]:
+        """Return the command's executable list with the binary as an absolute path
+        
+        A bare name is looked up once, on the command's PATH and then in
+        allowed_executable_dirs, keeping only matches inside the allowed dirs, so
+        the child runs the binary validation approved without searching PATH.
+        Names that can't be found are left for exec to resolve as before.
+        """
+        executable = list(cmd_config['executable'])
+        binary = executable[0]
+        if os.path.isabs(binary):
+            return executable
+        
+        allowed_prefixes = allowed_dir_prefixes(self.config.get('allowed_executable_dirs', []))
+        env = self.command_environment(cmd_config)[0]
+        for directory in [*os.get_exec_path(env), *allowed_prefixes]:
+            full_path = os.path.normpath(os.path.join(directory, binary))
+            if (full_path.startswith(allowed_prefixes) and os.path.isfile(full_path)
+                    and os.access(full_path, os.X_OK)):
+                executable[0] = full_path
+                break
+        return executable
+    
     def validate_request(self, request: Dict[str, Any]) -> Tuple[bool, str]:
         """Validate incoming request against configuration"""
         if 'command' not in request:
@@ -334,100 +853,177 @@ class ConfigurableSocketServer:
         command = request['command']
         
         # Special introspection commands
-        if command in ['__introspect__', '__ping__']:
+        if command in SPECIAL_COMMANDS and (command != '__stats__' or self.stats_enabled):
             return True, ""
             
         if command not in self.config['commands']:
             available = list(self.config['commands'].keys())
             return False, f"Unknown command '{command}'. Available: {available}"
             
-        cmd_config = self.config['commands'][command]
+        validator = self.command_validators.get(command)
+        if validator is None:
+            # Command added to the config after startup
+            validator = self.build_command_validator(self.config['commands'][command])
+            self.command_validators[command] = validator
         
-        # Validate parameters if defined
-        if 'parameters' in cmd_config:
-            for param_name, param_config in cmd_config['parameters'].items():
-                param_value = request.get('parameters', {}).get(param_name)
+        return validator(request.get('parameters') or {})
+    
+    def build_command_validator(self, cmd_config: Dict[str, Any]) -> Callable[[Dict[str, Any]], Tuple[bool, str]]:
+        """Build a function that validates a request's parameters for one command"""
+        checks = [
+            (param_name, param_config.get('required', False), self.build_parameter_check(param_config))
+            for param_name, param_config in cmd_config.get('parameters', {}).items()
+        ]
+        
+        def validate(parameters: Dict[str, Any]) -> Tuple[bool, str]:
+            for param_name, required, check in checks:
+                param_value = parameters.get(param_name)
                 
                 # Check required parameters
-                if param_config.get('required', False) and param_value is None:
-                    return False, f"Missing required parameter: {param_name}"
-                    
+                if param_value is None:
+                    if required:
+                        return False, f"Missing required parameter: {param_name}"
+                    continue
+                
                 # Validate parameter value
-                if param_value is not None:
-                    if not self.validate_parameter_value(param_value, param_config):
-                        return False, f"Invalid value for parameter '{param_name}'"
-                        
-        return True, ""
+                if not check(param_value):
+                    return False, f"Invalid value for parameter '{param_name}'"
+            
+            return True, ""
+        
+        return validate
+    
+    def build_argv_builder(self, cmd_config: Dict[str, Any]) -> Callable[[Dict[str, Any]], List[str]]:
+        """Build a function that turns a request's parameters into the command's argv"""
+        base = self.resolve_command_executable(cmd_config)
         
+        # Parameter name -> function returning its argv fragment, per parameter style
+        formatters = {}
+        for param_name, param_config in cmd_config.get('parameters', {}).items():
+            if not param_config:
+                continue
+            style = param_config.get('style', 'flag')
+            if style == 'flag':
+                formatters[param_name] = lambda value, flag=f"--{param_name}": (flag, str(value))
+            elif style == 'argument':
+                formatters[param_name] = lambda value: (str(value),)
+            elif style == 'single_flag':
+                formatters[param_name] = lambda value, prefix=f"--{param_name}=": (f"{prefix}{value}",)
+        
+        def build(parameters: Dict[str, Any]) -> List[str]:
+            argv = base[:]
+            # Request order, so positional arguments keep the order the client sent
+            for param_name, param_value in parameters.items():
+                formatter = formatters.get(param_name)
+                if formatter is not None:
+                    argv.extend(formatter(param_value))
+            return argv
+        
+        return build
+    
     def validate_parameter_value(self, value: Any, param_config: Dict[str, Any]) -> bool:
         """Validate a parameter value against its configuration"""
+        return self.build_parameter_check(param_config)(value)
+    
+    def build_parameter_check(self, param_config: Dict[str, Any]) -> Callable[[Any], bool]:
+        """Compile a parameter's type, pattern, enum and length rules into one check"""
         param_type = param_config.get('type', 'string')
+        expected_type = PARAMETER_TYPES.get(param_type)
+        is_string = param_type == 'string'
         
-        # Type validation
-        if param_type == 'string' and not isinstance(value, str):
-            return False
-        elif param_type == 'number' and not isinstance(value, (int, float)):
-            return False
-        elif param_type == 'boolean' and not isinstance(value, bool):
-            return False
-            
         # Pattern validation for strings
-        if param_type == 'string' and 'pattern' in param_config:
-            if not re.match(param_config['pattern'], value):
-                return False
-                
-        # Enum validation
-        if 'enum' in param_config:
-            if value not in param_config['enum']:
-                return False
+        pattern = re.compile(param_config['pattern']) if is_string and 'pattern' in param_config else None
+        
+        # Enum validation; a frozenset unless the entries are unhashable
+        enum_values = param_config.get('enum')
+        try:
+            enum_set = frozenset(enum_values) if enum_values is not None else None
+        except TypeError:
+            enum_set = None
         
         # Length validation for strings
-        if param_type == 'string' and 'max_length' in param_config:
-            if len(value) > param_config['max_length']:
+        max_length = param_config.get('max_length') if is_string else None
+        
+        # NEW: Default validation for strings without explicit rules,
+        # unless strict mode is disabled (opt-out)
+        use_default = (is_string and 'pattern' not in param_config and 'enum' not in param_config
+                       and self.config.get('strict_parameter_validation', True))
+        logger = self.logger
+        
+        def check(value: Any) -> bool:
+            # Type validation
+            if expected_type is not None and not isinstance(value, expected_type):
                 return False
+            
+            # Length first so an overlong value never reaches the pattern,
+            # where it could trigger heavy backtracking
+            if max_length is not None and len(value) > max_length:
+                return False
+            
+            if pattern is not None and not pattern.match(value):
+                return False
+            
+            if enum_values is not None:
+                try:
+                    allowed = value in (enum_set if enum_set is not None else enum_values)
+                except TypeError:  # Unhashable value (list/dict) checked against the set
+                    allowed = value in enum_values
+                if not allowed:
+                    return False
+            
+            if use_default:
+                if not DEFAULT_PARAMETER_PATTERN.match(value):
+                    logger.warning(
+                        "Parameter value %r failed default validation. "
+                        "Consider adding explicit 'pattern' or 'enum' validation in config.", value
+                    )
+                    return False
+                else:
+                    logger.debug("Applied default validation pattern to parameter (value: %r)", value)
+            
+            return True
         
-        # NEW: Default validation for strings without explicit rules
-        if param_type == 'string' and isinstance(value, str):
-            if 'pattern' not in param_config and 'enum' not in param_config:
-                # Check if strict mode is disabled (opt-out)
-                if self.config.get('strict_parameter_validation', True):
-                    # Conservative default: alphanumeric + basic safe punctuation
-                    default_pattern = r'^[a-zA-Z0-9._\-\s]+$'
-                    if not re.match(default_pattern, value):
-                        self.logger.warning(
-                            f"Parameter value '{value}' failed default validation. "
-                            f"Consider adding explicit 'pattern' or 'enum' validation in config."
-                        )
-                        return False
-                    else:
-                        self.logger.debug(
-                            f"Applied default validation pattern to parameter (value: '{value}')"
-                        )
-                
-        return True
+        return check
     
     def check_rate_limit(self, client_id: str) -> bool:
         """Check if client has exceeded rate limit"""
         if not self.config.get('enable_rate_limit', True):
             return True
             
-        now = time()
-        window = self.rate_limit['window']
+        now = monotonic()
+        cutoff = now - self.rate_limit['window']
         
-        # Clean old entries
-        self.request_times[client_id] = [
-            t for t in self.request_times[client_id] 
-            if now - t < window
-        ]
+        # Periodically forget clients with no requests left in the window
+        if next(self.rate_limit_checks) % self.rate_limit_sweep_interval == 0:
+            self.sweep_request_times(cutoff)
         
-        if len(self.request_times[client_id]) >= self.rate_limit['requests']:
+        # Only the last 'requests' timestamps are kept; the client is over
+        # the limit while the oldest of them is still inside the window
+        limit = self.rate_limit['requests']
+        times = self.request_times[client_id]
+        while len(times) > limit:  # The limit was lowered
+            times.popleft()
+        if len(times) >= limit and (not times or times[0] > cutoff):
             return False
             
-        self.request_times[client_id].append(now)
+        times.append(now)
+        if len(times) > limit:
+            times.popleft()
         return True
+    
+    def sweep_request_times(self, cutoff: float):
+        """Drop rate limit entries for clients whose last request is older than cutoff"""
+        for client_id, times in list(self.request_times.items()):
+            if not times or times[-1] <= cutoff:
+                self.request_times.pop(client_id, None)
         
     def handle_introspection(self) -> Dict[str, Any]:
         """Return server configuration for client introspection"""
+        # Shallow copy so request_id/keep_alive added later don't leak into the cache
+        return dict(self.introspection_response)
+    
+    def build_introspection_response(self) -> Dict[str, Any]:
+        """Build the introspection response from the loaded configuration"""
         return {
             'success': True,
             'server_info': {
@@ -454,88 +1050,169 @@ class ConfigurableSocketServer:
             return self.handle_introspection()
         elif command == '__ping__':
             return {'success': True, 'message': 'pong', 'timestamp': time()}
-            
+        elif command == '__list__':
+            return {'success': True, 'commands': list(self.config['commands'].keys())}
+        elif command == '__stats__':
+            return self.handle_stats()
+        
         cmd_config = self.config['commands'][command]
         
         # Build command to execute
-        executable = cmd_config['executable'].copy()
-        
-        # Add parameters
-        if 'parameters' in cmd_config and 'parameters' in request:
-            for param_name, param_value in request['parameters'].items():
-                param_config = cmd_config['parameters'].get(param_name)
-                if param_config:
-                    # Handle different parameter styles
-                    style = param_config.get('style', 'flag')
-                    if style == 'flag':
-                        executable.extend([f"--{param_name}", str(param_value)])
-                    elif style == 'argument':
-                        executable.append(str(param_value))
-                    elif style == 'single_flag':
-                        executable.append(f"--{param_name}={param_value}")
-                        
+        executable = self.build_command_argv(command, cmd_config, request)
+        timeout = cmd_config.get('timeout', 10)
+        
         try:
             # Execute with security restrictions
-            env = cmd_config.get('env', {'PATH': '/usr/bin:/bin'})  # Allow custom env or use restricted default
-            # NEW: Expand templates in environment variables
-            env = self._expand_env_templates(env)
-            cwd = cmd_config.get('cwd', '/')  # Safe working directory
-            timeout = cmd_config.get('timeout', 10)
+            env, cwd = self.command_environment(cmd_config)
             
-            self.logger.info(f"Executing: {' '.join(executable)}")
+            if cmd_config.get('persistent', False):
+                return self.execute_persistent_command(command, cmd_config, request, env, cwd, timeout)
             
-            result = subprocess.run(
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("Executing: %s", ' '.join(executable))
+            
+            # One byte past the limit is kept so decode_output can tell it was truncated
+            result = run_capped(
                 executable,
-                capture_output=True,
-                text=True,
+                self.max_output_size + 1,
                 timeout=timeout,
                 env=env,
                 cwd=cwd
             )
+            return self.command_response(command, cmd_config, result)
+        
+        except subprocess.TimeoutExpired:
+            return self.command_timeout_response(command, timeout)
+        except Exception as e:
+            return self.command_error_response(command, e)
+    
+    async def execute_command_async(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a command without blocking the event loop while it runs"""
+        command = request['command']
+        if command in SPECIAL_COMMANDS:
+            # Special commands answer immediately
+            return self.execute_command(request)
+        
+        cmd_config = self.config['commands'][command]
+        if cmd_config.get('persistent', False):
+            # Persistent commands wait on their process's lock; keep that off the loop
+            return await asyncio.get_running_loop().run_in_executor(None, self.execute_command, request)
+        
+        executable = self.build_command_argv(command, cmd_config, request)
+        timeout = cmd_config.get('timeout', 10)
+        
+        try:
+            env, cwd = self.command_environment(cmd_config)
             
-            # Limit output size
-            stdout = result.stdout[:self.max_output_size]
-            stderr = result.stderr[:self.max_output_size]
-            
-            if len(result.stdout) > self.max_output_size:
-                stdout += "\n... (output truncated)"
-            if len(result.stderr) > self.max_output_size:
-                stderr += "\n... (output truncated)"
-            
-            response = {
-                'success': result.returncode == 0,
-                'command': command,
-                'returncode': result.returncode,
-                'stdout': stdout.strip(),
-                'stderr': stderr.strip()
-            }
-            
-            # Add custom response processing if configured
-            if 'response_format' in cmd_config:
-                response = self.format_response(response, cmd_config['response_format'])
-                
-            return response
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("Executing: %s", ' '.join(executable))
             
+            result = await run_capped_async(
+                executable,
+                self.max_output_size + 1,
+                timeout=timeout,
+                env=env,
+                cwd=cwd
+            )
+            return self.command_response(command, cmd_config, result)
+        
         except subprocess.TimeoutExpired:
-            return {
-                'success': False,
-                'error': f"Command timeout after {timeout} seconds",
-                'command': command
-            }
+            return self.command_timeout_response(command, timeout)
         except Exception as e:
-            self.logger.error(f"Command execution error: {e}")
-            return {
-                'success': False,
-                'error': 'Command execution failed',
-                'details': str(e) if self.config.get('debug', False) else None,
-                'command': command
-            }
-            
+            return self.command_error_response(command, e)
+    
+    def build_command_argv(self, command: str, cmd_config: Dict[str, Any], request: Dict[str, Any]) -> List[str]:
+        """Build the argv for a request using the command's prebuilt argv builder"""
+        build_argv = self.argv_builders.get(command)
+        if build_argv is None:
+            # Command added to the config after startup
+            build_argv = self.build_argv_builder(cmd_config)
+            self.argv_builders[command] = build_argv
+        return build_argv(request.get('parameters') or {})
+    
+    def command_environment(self, cmd_config: Dict[str, Any]) -> Tuple[Dict[str, str], str]:
+        """Return the (env, cwd) a command runs with"""
+        env = cmd_config.get('env', {'PATH': '/usr/bin:/bin'})  # Allow custom env or use restricted default
+        # NEW: Expand templates in environment variables
+        env = self._expand_env_templates(env)
+        cwd = cmd_config.get('cwd', '/')  # Safe working directory
+        return env, cwd
+    
+    def command_response(self, command: str, cmd_config: Dict[str, Any],
+                         result: subprocess.CompletedProcess) -> Dict[str, Any]:
+        """Build the response for a finished command"""
+        # Limit output size before decoding so oversized output is never decoded
+        stdout = self.decode_output(result.stdout)
+        stderr = self.decode_output(result.stderr)
+        
+        response = {
+            'success': result.returncode == 0,
+            'command': command,
+            'returncode': result.returncode,
+            'stdout': stdout,
+            'stderr': stderr
+        }
+        
+        # Add custom response processing if configured
+        if 'response_format' in cmd_config:
+            response = self.format_response(response, cmd_config['response_format'])
+        
+        return response
+    
+    def command_timeout_response(self, command: str, timeout: float) -> Dict[str, Any]:
+        """Build the response for a command that ran past its timeout"""
+        return {
+            'success': False,
+            'error': f"Command timeout after {timeout} seconds",
+            'command': command
+        }
+    
+    def command_error_response(self, command: str, error: Exception) -> Dict[str, Any]:
+        """Build the response for a command that could not be run"""
+        self.logger.error(f"Command execution error: {error}")
+        return {
+            'success': False,
+            'error': 'Command execution failed',
+            'details': str(error) if self.config.get('debug', False) else None,
+            'command': command
+        }
+    
+    def execute_persistent_command(self, command: str, cmd_config: Dict[str, Any], request: Dict[str, Any],
+                                   env: Dict[str, str], cwd: str, timeout: float) -> Dict[str, Any]:
+        """Run a request through the command's long-lived process instead of spawning one"""
+        with self.persistent_commands_lock:
+            persistent = self.persistent_commands.get(command)
+            if persistent is None:
+                persistent = PersistentCommand(self.resolve_command_executable(cmd_config), env, cwd)
+                self.persistent_commands[command] = persistent
+        
+        # Like build_argv_builder, only declared (and so validated) parameters reach the process
+        declared = cmd_config.get('parameters', {})
+        parameters = {
+            param_name: param_value
+            for param_name, param_value in (request.get('parameters') or {}).items()
+            if param_name in declared
+        }
+        
+        payload = dumps_json({'command': command, 'parameters': parameters})
+        return self.command_response(command, cmd_config, persistent.call(payload, timeout))
+    
+    def decode_output(self, output: bytes) -> str:
+        """Truncate raw command output to max_output_size bytes, decode it and strip surrounding whitespace"""
+        if len(output) <= self.max_output_size:
+            # Strip ASCII whitespace from the bytes so the usual trailing newline
+            # doesn't cost a copy of the decoded text; str.strip() is then a no-op
+            # unless there is non-ASCII whitespace at either end
+            return str(output.strip(), 'utf-8', 'replace').strip()
+        # Decode straight from a view of the kept bytes instead of a sliced copy
+        text = str(memoryview(output)[:self.max_output_size], 'utf-8', 'replace')
+        return (text + "\n... (output truncated)").strip()
+    
     def format_response(self, response: Dict[str, Any], format_config: Dict[str, Any]) -> Dict[str, Any]:
         """Apply custom response formatting"""
         if format_config.get('parse_json', False) and response['stdout']:
             try:
-                response['parsed_output'] = json.loads(response['stdout'])
+                response['parsed_output'] = loads_json(response['stdout'])
             except json.JSONDecodeError:
                 response['parse_error'] = 'Output is not valid JSON'
                 
@@ -575,139 +1252,370 @@ class ConfigurableSocketServer:
                 dbus_path = f'{runtime_dir}/bus'
                 if os.path.exists(dbus_path):
                     env['DBUS_SESSION_BUS_ADDRESS'] = f'unix:path={dbus_path}'
-                    self.logger.debug(f"Auto-detected DBUS_SESSION_BUS_ADDRESS: {dbus_path}")
+                    self.logger.debug("Auto-detected DBUS_SESSION_BUS_ADDRESS: %s", dbus_path)
         
         return env
     
     def receive_full_message(self, client_socket: socket.socket) -> str:
         """Receive a complete message from client with size limits"""
+        return self._receive_message(client_socket)[0]
+    
+    def receive_request(self, client_socket: socket.socket) -> Dict[str, Any]:
+        """Receive and parse a request, reusing the completeness check's parse"""
+        data, request = self._receive_message(client_socket)
+        if request is None:
+            request = loads_json(data)
+        return request
+    
+    def _receive_message(self, client_socket: socket.socket) -> Tuple[str, Any]:
+        """Read a message; returns (text, parsed JSON or None if never parsed)"""
         client_socket.settimeout(5.0)
-        data = b""
+        buffer = RequestBuffer(self.max_request_size)
         
         while True:
             try:
-                chunk = client_socket.recv(4096)
-                if not chunk:
+                if buffer.frame is not None:
+                    # Length known: read the rest without intermediate chunks
+                    if buffer.recv_frame_into(client_socket):
+                        break
+                    continue
+                chunk = client_socket.recv(REQUEST_CHUNK_SIZE)
+                if not chunk or buffer.feed(chunk):
                     break
-                    
-                data += chunk
-                
-                # Check size limit
-                if len(data) > self.max_request_size:
-                    raise ValueError(f"Request too large (max {self.max_request_size} bytes)")
-                
-                # Try to decode and parse as JSON to check if message is complete
-                try:
-                    json.loads(data.decode('utf-8'))
-                    break  # Valid JSON received, message is complete
-                except json.JSONDecodeError:
-                    continue  # Keep reading
-                except UnicodeDecodeError:
-                    raise ValueError("Invalid UTF-8 in request")
-                    
+            
             except socket.timeout:
-                if data:
-                    break  # Use what we have
-                else:
-                    # No data received after timeout, will fall through to empty check
+                # Use what we have; no data at all falls through to the empty check
+                break
+        
+        return buffer.finish()
+    
+    async def receive_request_async(self, reader: asyncio.StreamReader, data: bytes = b'') -> Dict[str, Any]:
+        """Receive and parse a request from a stream, starting with any bytes already read"""
+        buffer = RequestBuffer(self.max_request_size)
+        
+        if not (data and buffer.feed(data)):
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(reader.read(REQUEST_CHUNK_SIZE), 5.0)
+                except asyncio.TimeoutError:
+                    # Use what we have; no data at all falls through to the empty check
+                    break
+                if not chunk or buffer.feed(chunk):
                     break
-                
-        if not data:
-            raise ValueError("Empty request")
-            
-        return data.decode('utf-8')
         
-    def handle_client(self, client_socket: socket.socket, client_addr: str):
-        """Handle a client connection"""
-        # For rate limiting, try to get client process info on Linux
-        client_id = f"client_{id(client_socket)}"
+        data, request = buffer.finish()
+        if request is None:
+            request = loads_json(data)
+        return request
+    
+    async def wait_for_next_request_async(self, reader: asyncio.StreamReader) -> bytes:
+        """Wait for another request on a keep-alive connection; returns its first bytes"""
         try:
-            # Try to get peer credentials (Linux-specific)
-            import struct
-            creds = client_socket.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
-            pid, uid, gid = struct.unpack('3i', creds)
-            auth_client_id = f"process_{pid}"
-        except (OSError, AttributeError, ImportError):
+            return await asyncio.wait_for(reader.read(REQUEST_CHUNK_SIZE), self.keep_alive_timeout)
+        except asyncio.TimeoutError:
+            return b''  # Idle timeout
+    
+    def wait_for_next_request(self, client_socket: socket.socket) -> bool:
+        """Wait for another request on a keep-alive connection"""
+        try:
+            client_socket.settimeout(self.keep_alive_timeout)
+            # Peek so the request bytes stay queued for receive_full_message
+            return bool(client_socket.recv(1, socket.MSG_PEEK))
+        except OSError:
+            # Idle timeout or client went away
+            return False
+    
+    def encode_response(self, response: Dict[str, Any]) -> bytes:
+        """Encode a response as compact JSON (no whitespace between tokens)"""
+        return dumps_json(response)
+    
+    def send_response(self, client_socket: socket.socket, response: Dict[str, Any]):
+        """Send a response as compact JSON"""
+        client_socket.sendall(self.encode_response(response))
+    
+    def handle_request(self, client_socket: socket.socket, client_id: str, auth_client_id: str) -> bool:
+        """Handle a single request on a client connection
+        
+        Returns True if the client asked to keep the connection open.
+        """
+        # Rate limiting
+        if not self.check_rate_limit(client_id):
+            client_socket.sendall(self.rate_limit_payload)
+            return False
+        
+        # Receive request with size limits
+        request = self.receive_request(client_socket)
+        self.logger.debug("Received request from %s: %s", client_id, request)
+        
+        # Authentication validation
+        error_response = self.auth_error_response(request, auth_client_id)
+        if error_response is not None:
+            self.send_response(client_socket, error_response)
+            return False
+        
+        # Validate request
+        valid, error_msg = self.validate_request(request)
+        if not valid:
+            response = {'success': False, 'error': error_msg}
+        elif (payload := self.plain_response_payload(request)) is not None:
+            # Nothing to add to a built-in response, send the pre-encoded bytes
+            client_socket.sendall(payload)
+            return False
+        else:
+            response = self.execute_command(request)
+        
+        keep_alive = self.finish_response(request, response)
+        
+        # Send response
+        self.send_response(client_socket, response)
+        
+        return keep_alive
+    
+    def auth_error_response(self, request: Dict[str, Any], auth_client_id: str) -> Optional[Dict[str, Any]]:
+        """Return an error response if the request fails authentication"""
+        if not self.auth_enabled:
+            return None
+        auth_valid, auth_error = self.validate_auth(request, auth_client_id)
+        if auth_valid:
+            return None
+        if auth_error == "rate_limited":
+            return {
+                'success': False,
+                'error': 'Too many failed authentication attempts. Please try again later.',
+                'request_id': request.get('request_id')
+            }
+        # auth_failed
+        return {
+            'success': False,
+            'error': 'Authentication failed',
+            'request_id': request.get('request_id')
+        }
+    
+    def plain_response_payload(self, request: Dict[str, Any]) -> Optional[bytes]:
+        """Pre-encoded response for a built-in that needs nothing echoed back, or None"""
+        if 'request_id' in request or (self.keep_alive_enabled and request.get('keep_alive') is True):
+            return None
+        command = request['command']
+        if command == '__introspect__':
+            return self.introspection_payload
+        if command == '__list__':
+            return self.list_payload
+        if command == '__ping__':
+            # Same content as execute_command's pong without building a dict
+            return PONG_PAYLOAD_PREFIX + repr(time()).encode() + b'}'
+        return None
+    
+    def finish_response(self, request: Dict[str, Any], response: Dict[str, Any]) -> bool:
+        """Echo request_id and confirm keep-alive; returns whether to keep the connection open"""
+        # Add request_id to response if provided
+        if 'request_id' in request:
+            response['request_id'] = request['request_id']
+        
+        # Confirm keep-alive so the client knows it may reuse the connection
+        keep_alive = self.keep_alive_enabled and request.get('keep_alive') is True
+        if keep_alive:
+            response['keep_alive'] = True
+        return keep_alive
+    
+    def record_latency(self, start: int):
+        """Count a request in the latency histogram, given its monotonic_ns() start"""
+        # Bucket n holds requests that took under 2**(n + 10) ns (bucket 0: < ~1us)
+        bucket = min(LATENCY_BUCKETS - 1, max(0, (monotonic_ns() - start).bit_length() - 10))
+        # Not locked: under threads a concurrent increment can rarely be lost
+        self.latency_histogram[bucket] += 1
+    
+    def handle_stats(self) -> Dict[str, Any]:
+        """Return request counts and the latency histogram"""
+        histogram = self.latency_histogram
+        return {
+            'success': True,
+            'requests': sum(histogram),
+            'uptime': time() - self.started_at,
+            'latency_histogram': [
+                {'le_ns': 1 << (bucket + 10), 'count': count}
+                for bucket, count in enumerate(histogram) if count
+            ]
+        }
+    
+    def get_peer_credentials(self, client_socket: socket.socket) -> Optional[Tuple[int, int, int]]:
+        """Return the connected peer's (pid, uid, gid), or None if unavailable"""
+        try:
+            creds = client_socket.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, PEERCRED_SIZE)
+            return PEERCRED_STRUCT.unpack(creds)
+        except (OSError, AttributeError, struct.error):
+            return None
+    
+    def identify_client(self, client_socket: socket.socket) -> Tuple[str, str]:
+        """Return (rate limit client id, auth client id) for a connection"""
+        # Identify the client by its peer credentials where available (Linux-specific)
+        connection_id = f"client_{id(client_socket)}"
+        creds = self.get_peer_credentials(client_socket)
+        if creds is None:
             # Fallback to socket ID if peer credentials not available
-            auth_client_id = client_id
+            return connection_id, connection_id
         
+        pid, uid, gid = creds
+        auth_client_id = f"process_{pid}"
+        if self.rate_limit_key == 'uid':
+            return f"user_{uid}", auth_client_id
+        elif self.rate_limit_key == 'pid':
+            return auth_client_id, auth_client_id
+        return connection_id, auth_client_id
+    
+    def configure_client_socket(self, client_socket: socket.socket):
+        """Apply per-connection socket options"""
         try:
-            # Rate limiting
-            if not self.check_rate_limit(client_id):
-                error_response = {
-                    'success': False,
-                    'error': 'Rate limit exceeded',
-                    'retry_after': self.rate_limit['window']
-                }
-                client_socket.send(json.dumps(error_response).encode())
-                return
-            
-            # Receive request with size limits
-            data = self.receive_full_message(client_socket)
-            
-            request = json.loads(data)
-            self.logger.debug(f"Received request from {client_id}: {request}")
-            
-            # Authentication validation
-            auth_valid, auth_error = self.validate_auth(request, auth_client_id)
-            if not auth_valid:
-                if auth_error == "rate_limited":
-                    error_response = {
-                        'success': False,
-                        'error': 'Too many failed authentication attempts. Please try again later.',
-                        'request_id': request.get('request_id')
-                    }
-                else:  # auth_failed
-                    error_response = {
-                        'success': False,
-                        'error': 'Authentication failed',
-                        'request_id': request.get('request_id')
-                    }
-                client_socket.send(json.dumps(error_response).encode())
-                return
-            
-            # Validate request
-            valid, error_msg = self.validate_request(request)
-            if not valid:
-                response = {'success': False, 'error': error_msg}
-            else:
-                response = self.execute_command(request)
-                
-            # Add request_id to response if provided
-            if 'request_id' in request:
-                response['request_id'] = request['request_id']
-                
-            # Send response
-            response_json = json.dumps(response)
-            client_socket.send(response_json.encode())
-            
-        except json.JSONDecodeError as e:
-            error_response = {'success': False, 'error': 'Invalid JSON', 'details': str(e)}
-            client_socket.send(json.dumps(error_response).encode())
-        except socket.timeout:
-            error_response = {'success': False, 'error': 'Request timeout'}
-            client_socket.send(json.dumps(error_response).encode())
-        except ValueError as e:
-            error_response = {'success': False, 'error': str(e)}
-            client_socket.send(json.dumps(error_response).encode())
+            # Let a whole response sit in the kernel instead of trickling out in small chunks
+            client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer_size)
+        except OSError:
+            pass
+    
+    def client_error_response(self, error: Exception) -> Dict[str, Any]:
+        """Build the response for an error raised while serving a connection"""
+        if isinstance(error, json.JSONDecodeError):
+            return {'success': False, 'error': 'Invalid JSON', 'details': str(error)}
+        if isinstance(error, socket.timeout):
+            return {'success': False, 'error': 'Request timeout'}
+        if isinstance(error, ValueError):
+            return {'success': False, 'error': str(error)}
+        
+        self.logger.error(f"Client handling error: {error}")
+        error_response = {'success': False, 'error': 'Internal server error'}
+        if self.config.get('debug', False):
+            error_response['details'] = str(error)
+        return error_response
+    
+    def dispatch_client(self, client_socket: socket.socket, client_addr: str):
+        """Queue a connection for the worker threads, or turn it away if the queue is full"""
+        if not self.connection_slots.acquire(blocking=False):
+            self.logger.warning("Connection queue full, rejecting client")
+            try:
+                client_socket.setblocking(False)
+                client_socket.send(self.busy_payload)
+            except OSError:
+                pass  # Client gone or not reading; it sees the connection close
+            client_socket.close()
+            return
+        self.executor.submit(self.handle_pooled_client, client_socket, client_addr)
+    
+    def handle_pooled_client(self, client_socket: socket.socket, client_addr: str):
+        """Serve a connection on a worker thread, then free its queue slot"""
+        try:
+            self.handle_client(client_socket, client_addr)
+        finally:
+            self.connection_slots.release()
+    
+    def handle_client(self, client_socket: socket.socket, client_addr: str):
+        """Handle a client connection"""
+        client_id, auth_client_id = self.identify_client(client_socket)
+        self.configure_client_socket(client_socket)
+        
+        try:
+            # Serve requests until the client stops asking for keep-alive
+            while True:
+                start = monotonic_ns()
+                keep_alive = self.handle_request(client_socket, client_id, auth_client_id)
+                self.record_latency(start)
+                if not keep_alive or not self.wait_for_next_request(client_socket):
+                    break
+        
         except Exception as e:
-            self.logger.error(f"Client handling error: {e}")
-            error_response = {'success': False, 'error': 'Internal server error'}
-            if self.config.get('debug', False):
-                error_response['details'] = str(e)
-            client_socket.send(json.dumps(error_response).encode())
+            self.send_response(client_socket, self.client_error_response(e))
         finally:
             try:
                 client_socket.close()
             except:
                 pass
-                
+    
+    async def handle_request_async(self, reader: asyncio.StreamReader, data: bytes, client_id: str,
+                                   auth_client_id: str) -> Tuple[bytes, bool]:
+        """Handle a single request on the event loop; returns (response bytes, keep-alive)"""
+        # Rate limiting
+        if not self.check_rate_limit(client_id):
+            return self.rate_limit_payload, False
+        
+        # Receive request with size limits
+        request = await self.receive_request_async(reader, data)
+        self.logger.debug("Received request from %s: %s", client_id, request)
+        
+        # Authentication validation
+        error_response = self.auth_error_response(request, auth_client_id)
+        if error_response is not None:
+            return self.encode_response(error_response), False
+        
+        # Validate request
+        valid, error_msg = self.validate_request(request)
+        if not valid:
+            response = {'success': False, 'error': error_msg}
+        elif (payload := self.plain_response_payload(request)) is not None:
+            return payload, False
+        else:
+            response = await self.execute_command_async(request)
+        
+        keep_alive = self.finish_response(request, response)
+        return self.encode_response(response), keep_alive
+    
+    async def handle_client_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Handle a client connection on the event loop (worker_model 'asyncio')"""
+        client_socket = writer.get_extra_info('socket')
+        client_id, auth_client_id = self.identify_client(client_socket)
+        self.configure_client_socket(client_socket)
+        
+        try:
+            data = b''
+            # Serve requests until the client stops asking for keep-alive
+            while True:
+                start = monotonic_ns()
+                payload, keep_alive = await self.handle_request_async(reader, data, client_id, auth_client_id)
+                writer.write(payload)
+                self.record_latency(start)
+                if not keep_alive:
+                    break
+                await writer.drain()
+                data = await self.wait_for_next_request_async(reader)
+                if not data:
+                    break
+        
+        except Exception as e:
+            writer.write(self.encode_response(self.client_error_response(e)))
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except (OSError, RuntimeError):
+                pass
+    
+    async def serve_async(self):
+        """Serve connections from an asyncio event loop until SIGINT/SIGTERM"""
+        loop = asyncio.get_running_loop()
+        stopped = asyncio.Event()
+        
+        def stop(signum):
+            self.logger.info(f"Received signal {signum}, shutting down gracefully...")
+            self.running = False
+            stopped.set()
+        
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop, signum)
+            except (RuntimeError, ValueError):
+                pass  # Not running in the main thread
+        
+        server = await asyncio.start_unix_server(self.handle_client_async, sock=self.server_socket,
+                                                 backlog=self.listen_backlog)
+        async with server:
+            await stopped.wait()
+        self.logger.info("Server socket closed by shutdown signal")
+    
     def start_server(self):
         """Start the Unix socket server"""
         try:
             # Remove existing socket
-            if os.path.exists(self.socket_path):
+            try:
                 os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
                 
             # Create parent directory if it doesn't exist
             socket_dir = os.path.dirname(self.socket_path)
@@ -731,7 +1639,7 @@ class ConfigurableSocketServer:
                     permissions = int(octal_str, 8)
             os.chmod(self.socket_path, permissions)
             
-            self.server_socket.listen(5)
+            self.server_socket.listen(self.listen_backlog)
             self.running = True
             
             self.logger.info(f"Server '{self.config['name']}' listening on {self.socket_path}")
@@ -743,18 +1651,32 @@ class ConfigurableSocketServer:
             if self.auth_enabled:
                 self.logger.info(f"Authentication rate limit: {self.auth_rate_limiter.max_attempts} attempts per {self.auth_rate_limiter.window_seconds} seconds")
             
+            if self.worker_model == 'process' and not self.run_worker_processes():
+                return  # Supervisor shut down; workers did the serving
+            
+            if self.worker_model == 'asyncio':
+                self.logger.info("Handling connections on an asyncio event loop")
+                if uvloop is not None and sys.version_info >= (3, 12):
+                    asyncio.run(self.serve_async(), loop_factory=uvloop.new_event_loop)
+                else:
+                    if uvloop is not None:
+                        uvloop.install()  # asyncio.run() has no loop_factory before 3.12
+                    asyncio.run(self.serve_async())
+                return
+            
+            if self.config.get('enable_threading', False):
+                # Bounded pool: bursts queue up instead of spawning a thread per connection
+                self.executor = ThreadPoolExecutor(max_workers=self.worker_threads,
+                                                   thread_name_prefix='client')
+                self.logger.info(f"Handling connections with up to {self.worker_threads} worker threads")
+            
             while self.running:
                 try:
                     client, addr = self.server_socket.accept()
                     
-                    # Handle client in a thread for concurrent connections
-                    if self.config.get('enable_threading', False):
-                        client_thread = threading.Thread(
-                            target=self.handle_client,
-                            args=(client, str(addr))
-                        )
-                        client_thread.daemon = True
-                        client_thread.start()
+                    # Handle client on a worker thread for concurrent connections
+                    if self.executor is not None:
+                        self.dispatch_client(client, str(addr))
                     else:
                         self.handle_client(client, str(addr))
                         
@@ -772,19 +1694,72 @@ class ConfigurableSocketServer:
         finally:
             self.cleanup()
             
+    def run_worker_processes(self) -> bool:
+        """Fork worker processes and supervise them until shutdown
+        
+        Every worker accepts on the inherited listening socket, so the kernel
+        spreads connections across them. Rate limit and auth state is kept per
+        worker. Returns True in a worker process (which should go on to serve)
+        and False in the supervisor once all workers have exited.
+        """
+        self.logger.info(f"Handling connections in {self.worker_processes} worker processes")
+        for _ in range(self.worker_processes):
+            if self.spawn_worker_process() == 0:
+                return True
+        
+        fast_exits = 0
+        while self.worker_pids:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.worker_pids.pop(pid, None)
+            if not self.running:
+                continue
+            
+            if started is not None and monotonic() - started < self.worker_min_uptime:
+                # Likely failing on startup; back off instead of forking in a tight loop
+                fast_exits += 1
+                delay = min(self.worker_max_restart_delay, 0.1 * 2 ** fast_exits)
+                self.logger.warning("Worker process %d exited with status %d right after starting, "
+                                    "restarting in %.1fs", pid, status, delay)
+                sleep(delay)
+            else:
+                fast_exits = 0
+                self.logger.warning("Worker process %d exited with status %d, restarting", pid, status)
+            if self.running and self.spawn_worker_process() == 0:
+                return True
+        return False
+    
+    def spawn_worker_process(self) -> int:
+        """Fork one worker process; returns 0 in the worker, its pid in the supervisor"""
+        pid = os.fork()
+        if pid == 0:
+            self.is_worker = True
+            self.worker_pids = {}
+        else:
+            self.worker_pids[pid] = monotonic()
+        return pid
+    
     def cleanup(self):
         """Clean up resources"""
         self.running = False
+        if self.executor is not None:
+            # Drop queued connections; in-flight requests finish on their own
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        for persistent in list(self.persistent_commands.values()):
+            persistent.close()
         if self.server_socket:
             try:
                 self.server_socket.close()
             except:
                 pass
-        if os.path.exists(self.socket_path):
+        # The socket file belongs to the supervisor when running worker processes
+        if not self.is_worker:
             try:
                 os.unlink(self.socket_path)
-            except:
-                pass
+            except OSError:
+                pass  # Already gone
             
     def signal_handler(self, signum, frame):
         """Handle shutdown signals"""
@@ -796,6 +1771,12 @@ class ConfigurableSocketServer:
                 self.server_socket.close()
             except:
                 pass
+        # Pass the shutdown on to worker processes so the supervisor's wait() returns
+        for pid in list(self.worker_pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
         
 
 def main():
@@ -869,6 +1850,7 @@ def main():
             "max_request_size": 1048576,
             "max_output_size": 100000,
             "enable_threading": False,
+            "worker_model": "thread",
             "strict_parameter_validation": True,
             "allowed_executable_dirs": [
                 "/usr/bin/",
@@ -929,7 +1911,11 @@ def main():
         print(f"Runtime user: {os.getuid()} ({pwd.getpwuid(os.getuid()).pw_name})")
         print(f"Commands: {list(server.config['commands'].keys())}")
         print(f"Rate limiting: {'Enabled' if server.config.get('enable_rate_limit', True) else 'Disabled'}")
-        print(f"Threading: {'Enabled' if server.config.get('enable_threading', False) else 'Disabled'}")
+        print(f"Worker model: {server.worker_model}")
+        if server.worker_model == 'thread':
+            print(f"Threading: {'Enabled' if server.config.get('enable_threading', False) else 'Disabled'}")
+        elif server.worker_model == 'process':
+            print(f"Worker processes: {server.worker_processes}")
         print(f"Authentication: {'Enabled' if server.auth_enabled else 'Disabled'}")
         if server.auth_enabled:
             print(f"Auth mode: SHA-256 hashed token (secure)")
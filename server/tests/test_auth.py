@@ -42,7 +42,7 @@ def test_auth_disabled():
         "socket_path": "/tmp/test-auth-disabled.sock",
         "allowed_executable_dirs": ["/bin/", "/usr/bin/"],
         "commands": {
-            "__ping__": {
+            "echo": {
                 "description": "Test ping",
                 "executable": ["echo", "pong"],
                 "timeout": 5
@@ -101,7 +101,7 @@ def test_auth_enabled():
         "socket_path": "/tmp/test-auth.sock",
         "allowed_executable_dirs": ["/bin/", "/usr/bin/"],
         "commands": {
-            "__ping__": {
+            "echo": {
                 "description": "Test ping",
                 "executable": ["echo", "pong"],
                 "timeout": 5
@@ -171,7 +171,7 @@ def test_rate_limiting():
         "socket_path": "/tmp/test-rate-limit.sock",
         "allowed_executable_dirs": ["/bin/", "/usr/bin/"],
         "commands": {
-            "__ping__": {
+            "echo": {
                 "description": "Test ping",
                 "executable": ["echo", "pong"],
                 "timeout": 5
@@ -289,7 +289,36 @@ class TestAuthenticationValidation:
         valid, error = server.validate_auth({}, "test_client")
         assert valid is False
         assert error == "auth_failed"
+    
+    def test_hashed_auth_compares_digests_in_constant_time(self):
+        """Test that token hashes are compared as raw digests with hmac.compare_digest"""
+        correct_token = "correct-hashed-token"
+        correct_token_hash = ConfigurableSocketServer.hash_token(correct_token)
+        server = self.create_server_with_auth('hashed', correct_token)
+        
+        with patch.object(socket_server.hmac, 'compare_digest', wraps=socket_server.hmac.compare_digest) as mock_compare:
+            # Hex case doesn't matter
+            valid, error = server.validate_auth({"auth_token_hash": correct_token_hash.upper()}, "test_client")
+            assert valid is True
+            assert mock_compare.call_count == 1
+        
+        # Non-string hashes are rejected
+        valid, error = server.validate_auth({"auth_token_hash": 12345}, "test_client")
+        assert valid is False
+        assert error == "auth_failed"
 
+    def test_valid_auth_checks_rate_limit_once(self):
+        """Test that a valid token consults the auth rate limiter only before checking the token"""
+        correct_token = "correct-hashed-token"
+        server = self.create_server_with_auth('hashed', correct_token)
+        
+        with patch.object(server.auth_rate_limiter, 'check_rate_limit', return_value=True) as mock_check:
+            valid, error = server.validate_auth(
+                {"auth_token_hash": ConfigurableSocketServer.hash_token(correct_token)}, "test_client")
+        
+        assert valid is True
+        mock_check.assert_called_once_with("test_client")
+    
     def test_auth_rate_limiting_integration(self):
         """Test that rate limiting works with authentication"""
         correct_token = "rate-limit-token"
@@ -376,6 +405,27 @@ class TestAuthRateLimiter:
         # Cleanup should remove old entries
         limiter.cleanup_old_entries()
         assert len(limiter.failed_attempts.get(client_id, [])) == 0
+    
+    def test_rate_limiter_expires_own_entries_and_sweeps_others(self):
+        """Test that a check expires the client's old failures and others are swept periodically"""
+        limiter = AuthRateLimiter(max_attempts=2, window_seconds=60, block_duration=60)
+        limiter.cleanup_interval = 3
+        limiter.failed_attempts["old_client"].append(time.monotonic() - 120)
+        limiter.failed_attempts["test_client"].append(time.monotonic() - 120)
+        limiter.record_failure("test_client")
+        
+        # The expired failure no longer counts towards the limit
+        assert limiter.check_rate_limit("test_client") is True
+        assert len(limiter.failed_attempts["test_client"]) == 1
+        assert "old_client" in limiter.failed_attempts
+        
+        # Checks don't create entries for clients without failures
+        assert limiter.check_rate_limit("new_client") is True
+        assert "new_client" not in limiter.failed_attempts
+        
+        # The third check sweeps every client
+        limiter.check_rate_limit("test_client")
+        assert "old_client" not in limiter.failed_attempts
 
 
 if __name__ == '__main__':
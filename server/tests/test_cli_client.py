@@ -21,6 +21,8 @@ SocketClient = cli_client.SocketClient
 format_table = cli_client.format_table
 print_server_info = cli_client.print_server_info
 parse_parameter_value = cli_client.parse_parameter_value
+parse_args = cli_client.parse_args
+build_parser = cli_client.build_parser
 
 class TestSocketClient:
     """Test cases for SocketClient class"""
@@ -64,8 +66,9 @@ class TestSocketClient:
         # Verify socket operations
         mock_socket.settimeout.assert_called_once_with(10)
         mock_socket.connect.assert_called_once_with("/tmp/test.sock")
-        mock_socket.send.assert_called_once_with(json.dumps(request).encode())
-        mock_socket.recv.assert_called_once_with(8192)
+        mock_socket.sendall.assert_called_once_with(cli_client.dumps_request(request))
+        mock_socket.shutdown.assert_called_once_with(socket.SHUT_WR)
+        mock_socket.recv.assert_called_once_with(65536)
         mock_socket.close.assert_called_once()
         
         # Verify result
@@ -251,7 +254,7 @@ class TestSocketClientIntegration:
             client.send_request(complex_request)
             
             # Verify the request was properly serialized
-            call_args = mock_socket.send.call_args[0][0]
+            call_args = mock_socket.sendall.call_args[0][0]
             sent_data = call_args.decode()
             parsed_request = json.loads(sent_data)
             
@@ -296,7 +299,7 @@ class TestSocketClientEdgeCases:
             result = client.send_request(request)
             
             # Should work without issues
-            mock_socket.send.assert_called()
+            mock_socket.sendall.assert_called()
     
     def test_unicode_handling(self):
         """Test handling of unicode characters in requests and responses"""
@@ -325,7 +328,7 @@ class TestSocketClientEdgeCases:
             assert result["message"] == "Hello 世界 🌍"
             
             # Verify request was sent with proper encoding
-            sent_data = mock_socket.send.call_args[0][0]
+            sent_data = mock_socket.sendall.call_args[0][0]
             decoded_request = json.loads(sent_data.decode('utf-8'))
             assert decoded_request["message"] == "Hello 世界 🌍"
 
@@ -369,19 +372,19 @@ class TestEnhancedSocketClient:
         # Should have written verbose output to stderr
         mock_stderr.write.assert_called()
         
-    @patch('os.path.exists')
-    def test_permission_check_before_connection(self, mock_exists):
-        """Test that client checks permissions before attempting connection"""
-        mock_exists.return_value = True
+    @patch('socket.socket')
+    def test_permission_denied_from_connect(self, mock_socket_class):
+        """Test that a PermissionError from connect() is reported as permission denied"""
+        mock_socket = Mock()
+        mock_socket_class.return_value = mock_socket
+        mock_socket.connect.side_effect = PermissionError()
         
-        with patch('os.access') as mock_access:
-            mock_access.return_value = False  # No permissions
-            
-            client = SocketClient("/tmp/test.sock")
-            result = client.send_request({"command": "__ping__"})
-            
-            assert "error" in result
-            assert "Permission denied" in result["error"]
+        client = SocketClient("/tmp/test.sock")
+        result = client.send_request({"command": "__ping__"})
+        
+        assert "error" in result
+        assert "Permission denied" in result["error"]
+        mock_socket.close.assert_called_once()
     
     def test_receive_full_response_with_size_limit(self):
         """Test receive_full_response respects size limits"""
@@ -412,6 +415,62 @@ class TestEnhancedSocketClient:
         result = client.receive_full_response(mock_socket)
         assert result == test_data
     
+    def test_dumps_request_without_orjson(self):
+        """Test that requests encode with the stdlib when orjson is not installed"""
+        request = {"command": "echo", "parameters": {"message": "héllo"}}
+        with patch.object(cli_client, 'orjson', None):
+            data = cli_client.dumps_request(request)
+        assert isinstance(data, bytes)
+        assert json.loads(data) == request
+    
+    def test_dumps_request_falls_back_for_big_ints(self):
+        """Test that values orjson can't encode, like >64-bit ints, still encode"""
+        request = {"command": "echo", "parameters": {"n": 123456789012345678901234567890}}
+        
+        assert cli_client.dumps_request(request) == b'{"command":"echo","parameters":{"n":123456789012345678901234567890}}'
+        assert "123456789012345678901234567890" in cli_client.dumps_pretty(request)
+    
+    def test_dumps_request_is_compact(self):
+        """Test that wire requests carry no whitespace with or without orjson"""
+        request = {"command": "echo", "parameters": {"count": [1, 2]}}
+        expected = b'{"command":"echo","parameters":{"count":[1,2]}}'
+        assert cli_client.dumps_request(request) == expected
+        with patch.object(cli_client, 'orjson', None):
+            assert cli_client.dumps_request(request) == expected
+    
+    def test_dumps_pretty_without_orjson(self):
+        """Test that pretty output matches json.dumps(indent=2) when orjson is not installed"""
+        obj = {"success": True, "message": "héllo", "items": [1, 2]}
+        with patch.object(cli_client, 'orjson', None):
+            assert cli_client.dumps_pretty(obj) == json.dumps(obj, indent=2, ensure_ascii=False)
+    
+    def test_receive_full_response_only_parses_at_closing_brace(self):
+        """Test that chunks ending mid-object don't trigger a parse or shorten the timeout"""
+        client = SocketClient("/tmp/test.sock")
+        
+        mock_socket = Mock()
+        mock_socket.recv.side_effect = [b'{"a": {"b": 1}', b', "c": "x"', b'}']
+        
+        with patch.object(cli_client, 'loads_response', wraps=cli_client.loads_response) as mock_loads:
+            result = client.receive_full_response(mock_socket)
+        
+        assert result == '{"a": {"b": 1}, "c": "x"}'
+        assert mock_loads.call_count == 2
+        mock_socket.settimeout.assert_not_called()
+    
+    def test_receive_response_parses_once(self):
+        """Test that the completeness check's parse result is returned as the response"""
+        client = SocketClient("/tmp/test.sock")
+        
+        mock_socket = Mock()
+        mock_socket.recv.return_value = b'{"success": true, "data": [1, 2]}'
+        
+        with patch.object(cli_client, 'loads_response', wraps=cli_client.loads_response) as mock_loads:
+            result = client.receive_response(mock_socket)
+        
+        assert result == {"success": True, "data": [1, 2]}
+        assert mock_loads.call_count == 1
+    
     def test_receive_full_response_timeout_handling(self):
         """Test receive_full_response handles timeouts gracefully"""
         client = SocketClient("/tmp/test.sock")
@@ -423,6 +482,53 @@ class TestEnhancedSocketClient:
         result = client.receive_full_response(mock_socket)
         assert result == "partial"
 
+    @patch('socket.socket')
+    @patch('os.access')
+    @patch('os.path.exists')
+    def test_keep_alive_reuses_connection(self, mock_exists, mock_access, mock_socket_class):
+        """Test that keep-alive mode reuses the connection the server kept open"""
+        mock_exists.return_value = True
+        mock_access.return_value = True
+        
+        mock_socket = Mock()
+        mock_socket_class.return_value = mock_socket
+        mock_socket.recv.side_effect = [
+            b'{"success": true, "keep_alive": true}',
+            BlockingIOError(),  # Liveness peek: nothing pending, still open
+            b'{"success": true, "keep_alive": true}',
+        ]
+        
+        with SocketClient("/tmp/test.sock", keep_alive=True) as client:
+            assert client.ping() == {"success": True}
+            assert client.ping() == {"success": True}
+            mock_socket.close.assert_not_called()
+        
+        assert mock_socket_class.call_count == 1
+        mock_socket.connect.assert_called_once_with("/tmp/test.sock")
+        mock_socket.shutdown.assert_not_called()
+        sent = json.loads(mock_socket.sendall.call_args[0][0].decode())
+        assert sent == {"command": "__ping__", "keep_alive": True}
+        mock_socket.close.assert_called_once()
+    
+    @patch('socket.socket')
+    @patch('os.access')
+    @patch('os.path.exists')
+    def test_keep_alive_not_confirmed_closes_connection(self, mock_exists, mock_access, mock_socket_class):
+        """Test that the connection is closed when the server does not confirm keep-alive"""
+        mock_exists.return_value = True
+        mock_access.return_value = True
+        
+        mock_socket = Mock()
+        mock_socket_class.return_value = mock_socket
+        mock_socket.recv.return_value = b'{"success": true}'
+        
+        client = SocketClient("/tmp/test.sock", keep_alive=True)
+        client.ping()
+        client.ping()
+        
+        assert mock_socket_class.call_count == 2
+        assert mock_socket.close.call_count == 2
+
 
 class TestParameterValueParsing:
     """Test cases for enhanced parameter value parsing"""
@@ -548,6 +654,12 @@ class TestCLITableFormatting:
         # Should still show headers
         assert "Column1" in result
         assert "Column2" in result
+    
+    def test_write_raw_stdout_writes_utf8_bytes(self, capfdbinary):
+        """Test that --output-only output is written as raw UTF-8 bytes"""
+        cli_client.write_raw_stdout("line 1\nhéllo 🌍\n")
+        
+        assert capfdbinary.readouterr().out == "line 1\nhéllo 🌍\n".encode('utf-8')
 
 
 class TestServerInfoPrinting:
@@ -644,6 +756,31 @@ class TestServerInfoPrinting:
 class TestEnhancedClientMethods:
     """Test cases for enhanced client methods"""
     
+    @patch.object(SocketClient, 'send_request')
+    def test_list_commands(self, mock_send_request):
+        """Test list_commands uses the lightweight __list__ request"""
+        mock_send_request.return_value = {"success": True, "commands": ["a", "b"]}
+        
+        client = SocketClient("/tmp/test.sock")
+        result = client.list_commands()
+        
+        mock_send_request.assert_called_once_with({"command": "__list__"})
+        assert result["commands"] == ["a", "b"]
+    
+    @patch.object(SocketClient, 'send_request')
+    def test_list_commands_falls_back_to_introspection(self, mock_send_request):
+        """Test list_commands falls back to introspection on older servers"""
+        mock_send_request.side_effect = [
+            {"success": False, "error": "Unknown command '__list__'. Available: ['a']"},
+            {"success": True, "server_info": {"name": "Old", "commands": {"a": {}}}},
+        ]
+        
+        client = SocketClient("/tmp/test.sock")
+        result = client.list_commands()
+        
+        assert mock_send_request.call_args_list[1][0][0] == {"command": "__introspect__"}
+        assert result == {"success": True, "commands": ["a"]}
+    
     @patch.object(SocketClient, 'send_request')
     def test_execute_command_with_parameters(self, mock_send_request):
         """Test execute_command method with parameters"""
@@ -700,37 +837,50 @@ class TestCLIArgumentParsing:
         result = parse_parameter_value('plain text')
         assert isinstance(result, str)
 
+    def test_bare_action_fast_path_matches_parser(self):
+        """Test that bare actions parse identically with and without argparse"""
+        for action in ['introspect', 'ping', 'list', 'test']:
+            argv = ['/tmp/test.sock', action]
+            assert vars(parse_args(argv)) == vars(build_parser().parse_args(argv))
+    
+    def test_options_use_full_parser(self):
+        """Test that arguments with options still go through argparse"""
+        args = parse_args(['/tmp/test.sock', '--timeout', '5', 'ping', '--count', '3'])
+        assert args.timeout == 5
+        assert args.count == 3
+        assert args.interval == 1.0
+        assert args.action == 'ping'
+    
+    def test_ping_interval_option(self):
+        """Test that --interval 0 is accepted for back-to-back pings"""
+        args = parse_args(['/tmp/test.sock', 'ping', '--count', '5', '--interval', '0'])
+        assert args.count == 5
+        assert args.interval == 0.0
+
 
 class TestEnhancedErrorHandling:
     """Test cases for enhanced error handling in CLI client"""
     
     @patch('socket.socket')
-    @patch('os.access')
-    @patch('os.path.exists')
-    def test_detailed_connection_errors(self, mock_exists, mock_access, mock_socket_class):
+    def test_detailed_connection_errors(self, mock_socket_class):
         """Test detailed connection error messages"""
         mock_socket = Mock()
         mock_socket_class.return_value = mock_socket
         
         # Test different error scenarios
         # FileNotFoundError - socket file doesn't exist
-        mock_exists.return_value = False
+        mock_socket.connect.side_effect = FileNotFoundError()
         client = SocketClient("/tmp/test.sock")
         result = client.send_request({"command": "__ping__"})
         assert "error" in result
         assert "socket not found" in result["error"].lower()
         
         # PermissionError - socket exists but no permission
-        mock_exists.return_value = True
-        mock_access.return_value = False
+        mock_socket.connect.side_effect = PermissionError()
         result = client.send_request({"command": "__ping__"})
         assert "error" in result
         assert "permission denied" in result["error"].lower()
         
-        # Connection errors - socket exists and has permission but connection fails
-        mock_exists.return_value = True
-        mock_access.return_value = True
-        
         # ConnectionRefusedError
         mock_socket.connect.side_effect = ConnectionRefusedError("Connection refused")
         result = client.send_request({"command": "__ping__"})
@@ -155,14 +155,14 @@ class TestServerClientIntegration:
         assert "commands" in result["server_info"]
         assert "echo" in result["server_info"]["commands"]
     
-    @patch('subprocess.run')
+    @patch.object(socket_server, 'run_capped')
     def test_echo_command_integration(self, mock_subprocess, config_file, temp_socket_path):
         """Test echo command with parameters through full integration"""
-        # Mock subprocess for echo command
+        # Mock command execution for echo command
         mock_result = type('MockResult', (), {
             'returncode': 0,
-            'stdout': 'test message',
-            'stderr': ''
+            'stdout': b'test message',
+            'stderr': b''
         })()
         mock_subprocess.return_value = mock_result
         
@@ -189,7 +189,7 @@ class TestServerClientIntegration:
         # Verify subprocess was called correctly
         mock_subprocess.assert_called_once()
         call_args = mock_subprocess.call_args
-        assert "echo" in call_args[0][0]
+        assert os.path.basename(call_args[0][0][0]) == "echo"
         assert "test message" in call_args[0][0]
     
     def test_invalid_command_integration(self, config_file, temp_socket_path):
@@ -322,6 +322,79 @@ class TestServerLifecycle:
         # Cleanup
         server.server_socket.close()
         os.unlink(temp_socket_path)
+    
+    def test_worker_processes_serve_and_shut_down(self, sample_config, temp_socket_path):
+        """Test that pre-forked worker processes answer requests and stop with the supervisor"""
+        import subprocess
+        
+        config = sample_config.copy()
+        config['socket_path'] = temp_socket_path
+        config['worker_model'] = 'process'
+        config['worker_processes'] = 2
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(config, f)
+            temp_config = f.name
+        
+        server_proc = subprocess.Popen([sys.executable, socket_server_path, temp_config],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(50):
+                if os.path.exists(temp_socket_path):
+                    break
+                time.sleep(0.1)
+            
+            client = SocketClient(temp_socket_path)
+            for _ in range(4):
+                assert client.ping()["success"] == True
+            
+            server_proc.send_signal(signal.SIGTERM)
+            assert server_proc.wait(timeout=5) == 0
+            assert not os.path.exists(temp_socket_path)
+        finally:
+            if server_proc.poll() is None:
+                server_proc.kill()
+                server_proc.wait()
+            os.unlink(temp_config)
+    
+    def test_asyncio_worker_model_serves_requests(self, sample_config, temp_socket_path):
+        """Test that the asyncio worker model runs commands, keeps connections alive and shuts down"""
+        import subprocess
+        
+        config = sample_config.copy()
+        config['socket_path'] = temp_socket_path
+        config['worker_model'] = 'asyncio'
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(config, f)
+            temp_config = f.name
+        
+        server_proc = subprocess.Popen([sys.executable, socket_server_path, temp_config],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(50):
+                if os.path.exists(temp_socket_path):
+                    break
+                time.sleep(0.1)
+            
+            client = SocketClient(temp_socket_path)
+            result = client.execute_command("echo", {"message": "hello async"})
+            assert result["success"] == True
+            assert result["stdout"] == "hello async"
+            assert client.introspect()["server_info"]["name"] == config["name"]
+            
+            with SocketClient(temp_socket_path, keep_alive=True) as keep_alive_client:
+                assert keep_alive_client.ping()["success"] == True
+                assert keep_alive_client.execute_command("simple")["stdout"] == "hello"
+            
+            server_proc.send_signal(signal.SIGTERM)
+            assert server_proc.wait(timeout=5) == 0
+            assert not os.path.exists(temp_socket_path)
+        finally:
+            if server_proc.poll() is None:
+                server_proc.kill()
+                server_proc.wait()
+            os.unlink(temp_config)
 
 class TestErrorRecovery:
     """Test error recovery and edge cases"""
@@ -371,7 +444,7 @@ class TestErrorRecovery:
         
         thread.join(timeout=3)
     
-    @patch('subprocess.run')
+    @patch.object(socket_server, 'run_capped')
     def test_command_execution_error_handling(self, mock_subprocess, config_file, temp_socket_path):
         """Test handling of command execution errors"""
         # Mock subprocess to raise an exception
@@ -4,7 +4,11 @@ Tests the improved server with rate limiting, size limits, and security features
 """
 import pytest
 import json
+import logging
+import socket
+import struct
 import subprocess
+import threading
 import tempfile
 from unittest.mock import Mock, patch
 import sys
@@ -91,6 +95,23 @@ class TestConfigurableSocketServer:
         assert server.validate_executable_path(['/home/user/script.sh']) == False
         assert server.validate_executable_path([]) == False
     
+    @pytest.mark.parametrize("name", ["__list__", "__stats__"])
+    def test_reserved_command_name_rejected(self, sample_config, name, capsys):
+        """Test that a command can't be named after a built-in that would shadow it"""
+        config = sample_config.copy()
+        config['commands'] = {name: {'executable': ['echo']}}
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(config, f)
+            temp_config = f.name
+        
+        try:
+            with pytest.raises(SystemExit):
+                ConfigurableSocketServer(temp_config)
+            assert f"Command name '{name}' is reserved" in capsys.readouterr().out
+        finally:
+            os.unlink(temp_config)
+    
     def test_rate_limiting_functionality(self, config_file):
         """Test rate limiting with improved implementation"""
         server = ConfigurableSocketServer(config_file)
@@ -201,6 +222,11 @@ class TestRequestValidation:
         is_valid, error = server.validate_request({"command": "__ping__"})
         assert is_valid
         assert error == ""
+        
+        # Test __list__ command
+        is_valid, error = server.validate_request({"command": "__list__"})
+        assert is_valid
+        assert error == ""
 
 
 class TestCommandExecution:
@@ -218,7 +244,93 @@ class TestCommandExecution:
         assert "timestamp" in result
         assert isinstance(result["timestamp"], float)
     
-    @patch('subprocess.run')
+    def test_execute_list_returns_command_names(self, config_file):
+        """Test that __list__ returns only the command names"""
+        server = ConfigurableSocketServer(config_file)
+        
+        result = server.execute_command({"command": "__list__"})
+        
+        assert result == {"success": True, "commands": ["echo", "simple", "with-flags"]}
+    
+    def test_record_latency_buckets_by_power_of_two(self, config_file):
+        """Test that request latencies land in power-of-two nanosecond buckets"""
+        server = ConfigurableSocketServer(config_file)
+        
+        with patch.object(socket_server, 'monotonic_ns', return_value=1_000_000):
+            server.record_latency(1_000_000)        # 0ns -> first bucket
+            server.record_latency(1_000_000 - 3000)  # 3us -> under 4096ns
+            server.record_latency(1_000_000 - 3500)
+        
+        result = server.execute_command({"command": "__stats__"})
+        
+        assert result["requests"] == 3
+        assert result["latency_histogram"] == [
+            {"le_ns": 1024, "count": 1},
+            {"le_ns": 4096, "count": 2}
+        ]
+    
+    def test_stats_disabled_by_default(self, config_file):
+        """Test that __stats__ is an unknown command unless enable_stats is set"""
+        server = ConfigurableSocketServer(config_file)
+        
+        valid, error = server.validate_request({"command": "__stats__"})
+        assert valid == False
+        assert "Unknown command '__stats__'" in error
+        
+        server.stats_enabled = True
+        assert server.validate_request({"command": "__stats__"}) == (True, "")
+    
+    def test_argv_builder_applies_parameter_styles(self, config_file):
+        """Test that the prebuilt argv builder formats each style and keeps request order"""
+        server = ConfigurableSocketServer(config_file)
+        build = server.build_argv_builder({
+            'executable': ['tool', 'run'],
+            'parameters': {
+                'name': {'style': 'argument'},
+                'level': {'style': 'flag'},
+                'player': {'style': 'single_flag'},
+                'other': {'style': 'argument'}
+            }
+        })
+        
+        assert build({'other': 'b', 'level': 3, 'unknown': 'x', 'player': 'spotify', 'name': 'a'}) == [
+            'tool', 'run', 'b', '--level', '3', '--player=spotify', 'a'
+        ]
+        assert build({}) == ['tool', 'run']
+    
+    def test_run_capped_keeps_limit_and_real_returncode(self):
+        """Test that output past the limit is discarded while the command still runs to the end"""
+        result = socket_server.run_capped(
+            ['sh', '-c', 'head -c 200000 /dev/zero; echo err >&2; exit 3'], 100, timeout=5
+        )
+        
+        assert result.returncode == 3
+        assert result.stdout == b'\0' * 100
+        assert result.stderr == b'err\n'
+    
+    def test_run_capped_async_matches_run_capped(self):
+        """Test that the asyncio runner caps output and keeps the return code the same way"""
+        import asyncio
+        
+        result = asyncio.run(socket_server.run_capped_async(
+            ['sh', '-c', 'head -c 200000 /dev/zero; echo err >&2; exit 3'], 100, timeout=5
+        ))
+        
+        assert result.returncode == 3
+        assert result.stdout == b'\0' * 100
+        assert result.stderr == b'err\n'
+        
+        with pytest.raises(subprocess.TimeoutExpired):
+            asyncio.run(socket_server.run_capped_async(['sleep', '10'], 100, timeout=0.3))
+    
+    def test_run_capped_kills_on_timeout(self):
+        """Test that a command that outlives its timeout is killed"""
+        start = time.monotonic()
+        with pytest.raises(subprocess.TimeoutExpired):
+            socket_server.run_capped(['sleep', '10'], 100, timeout=0.3)
+        assert time.monotonic() - start < 5
+    
+    @patch.object(socket_server, 'run_capped')
     def test_execute_command_with_output_truncation(self, mock_subprocess, config_file):
         """Test that large output is truncated"""
         server = ConfigurableSocketServer(config_file)
@@ -227,8 +339,8 @@ class TestCommandExecution:
         # Mock large output
         mock_result = Mock()
         mock_result.returncode = 0
-        mock_result.stdout = "x" * 200  # Exceeds limit
-        mock_result.stderr = ""
+        mock_result.stdout = b"x" * 200  # Exceeds limit
+        mock_result.stderr = b""
         mock_subprocess.return_value = mock_result
         
         request = {"command": "simple"}
@@ -238,7 +350,7 @@ class TestCommandExecution:
         assert len(result["stdout"]) <= server.max_output_size + 50  # Allow for truncation message
         assert "truncated" in result["stdout"]
     
-    @patch('subprocess.run')
+    @patch.object(socket_server, 'run_capped')
     def test_execute_command_with_custom_env(self, mock_subprocess, sample_config):
         """Test command execution with custom environment variables"""
         config = sample_config.copy()
@@ -264,7 +376,7 @@ class TestCommandExecution:
         finally:
             os.unlink(temp_config)
     
-    @patch('subprocess.run')
+    @patch.object(socket_server, 'run_capped')
     def test_execute_command_with_debug_mode(self, mock_subprocess, sample_config):
         """Test that debug mode provides detailed error information"""
         config = sample_config.copy()
@@ -310,6 +422,40 @@ class TestParameterValidation:
         assert server.validate_parameter_value(True, {"type": "boolean"}) == True
         assert server.validate_parameter_value(False, {"type": "boolean"}) == True
         assert server.validate_parameter_value("true", {"type": "boolean"}) == False
+    
+    def test_command_validators_built_at_startup(self, config_file):
+        """Test that every configured command gets a compiled parameter validator"""
+        server = ConfigurableSocketServer(config_file)
+        
+        assert set(server.command_validators) == set(server.config['commands'])
+        assert server.command_validators['echo']({"message": "hello"}) == (True, "")
+        assert server.command_validators['echo']({"message": "bad;rm"})[0] == False
+    
+    def test_enum_with_unhashable_values(self, config_file):
+        """Test enum validation when the value or the enum entries are unhashable"""
+        server = ConfigurableSocketServer(config_file)
+        
+        assert server.validate_parameter_value(["a"], {"type": "array", "enum": [["a"], ["b"]]}) == True
+        assert server.validate_parameter_value(["c"], {"type": "array", "enum": ["a", "b"]}) == False
+    
+    def test_invalid_pattern_rejected_at_load(self, sample_config):
+        """Test that a parameter pattern that does not compile fails config loading"""
+        config = sample_config.copy()
+        config['commands'] = dict(config['commands'])
+        config['commands']['broken'] = {
+            'executable': ['echo'],
+            'parameters': {'value': {'type': 'string', 'pattern': '([a-z'}}
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(config, f)
+            temp_config = f.name
+        
+        try:
+            with pytest.raises(SystemExit):
+                ConfigurableSocketServer(temp_config)
+        finally:
+            os.unlink(temp_config)
 
 
 class TestConcurrency:
@@ -388,6 +534,112 @@ class TestEnhancedRateLimiting:
         
         # Should be allowed again
         assert server.check_rate_limit(client_id) == True
+    
+    def test_rate_limiting_sweeps_idle_clients(self, config_file):
+        """Test that clients with no requests in the window are forgotten"""
+        server = ConfigurableSocketServer(config_file)
+        server.rate_limit = {'requests': 2, 'window': 60}
+        server.rate_limit_sweep_interval = 3
+        
+        # Pretend client_1's last request happened before the window
+        assert server.check_rate_limit('client_1') == True
+        server.request_times['client_1'][0] -= 120
+        
+        # The third check triggers a sweep
+        assert server.check_rate_limit('client_2') == True
+        assert server.check_rate_limit('client_2') == True
+        
+        assert 'client_1' not in server.request_times
+        assert 'client_2' in server.request_times
+    
+    def test_rate_limiting_keeps_only_last_requests(self, config_file):
+        """Test that at most 'requests' timestamps are stored and the oldest decides admission"""
+        server = ConfigurableSocketServer(config_file)
+        server.rate_limit = {'requests': 3, 'window': 60}
+        
+        for _ in range(3):
+            assert server.check_rate_limit('client') == True
+        assert server.check_rate_limit('client') == False
+        assert len(server.request_times['client']) == 3
+        
+        # Once the oldest request leaves the window, one more is admitted
+        server.request_times['client'][0] -= 120
+        assert server.check_rate_limit('client') == True
+        assert server.check_rate_limit('client') == False
+        assert len(server.request_times['client']) == 3
+    
+    def test_rate_limiting_zero_requests_rejects(self, config_file):
+        """Test that a limit of zero requests rejects every request instead of failing"""
+        server = ConfigurableSocketServer(config_file)
+        server.rate_limit = {'requests': 0, 'window': 60}
+        
+        assert server.check_rate_limit('client') == False
+        assert server.check_rate_limit('client') == False
+    
+    def test_rate_limit_change_applies_to_existing_clients(self, config_file):
+        """Test that lowering the limit after startup also limits clients already tracked"""
+        server = ConfigurableSocketServer(config_file)
+        server.rate_limit = {'requests': 5, 'window': 60}
+        for _ in range(3):
+            assert server.check_rate_limit('client') == True
+        
+        server.rate_limit = {'requests': 2, 'window': 60}
+        assert server.check_rate_limit('client') == False
+        assert len(server.request_times['client']) == 2
+    
+    def _rate_limit_client_ids(self, server):
+        """Collect the rate limit client ids handle_client assigns to two connections"""
+        client_ids = []
+        
+        def fake_handle_request(client_socket, client_id, auth_client_id):
+            client_ids.append(client_id)
+            return False
+        
+        with patch.object(server, 'handle_request', side_effect=fake_handle_request):
+            for _ in range(2):
+                server_end, client_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    server.handle_client(server_end, "test")
+                finally:
+                    client_end.close()
+        return client_ids
+    
+    def test_rate_limit_key_uid(self, config_file):
+        """Test that rate_limit_key 'uid' makes connections from the same user share one rate limit"""
+        server = ConfigurableSocketServer(config_file)
+        server.rate_limit_key = 'uid'
+        
+        assert self._rate_limit_client_ids(server) == [f"user_{os.getuid()}"] * 2
+    
+    def test_rate_limit_key_pid(self, config_file):
+        """Test that rate_limit_key 'pid' keys clients by peer process"""
+        server = ConfigurableSocketServer(config_file)
+        server.rate_limit_key = 'pid'
+        
+        assert self._rate_limit_client_ids(server) == [f"process_{os.getpid()}"] * 2
+    
+    def test_rate_limit_key_defaults_to_connection(self, config_file):
+        """Test that by default each connection has its own rate limit, as before rate_limit_key existed"""
+        server = ConfigurableSocketServer(config_file)
+        assert server.rate_limit_key == 'connection'
+        
+        client_ids = self._rate_limit_client_ids(server)
+        assert all(client_id.startswith("client_") for client_id in client_ids)
+    
+    def test_invalid_rate_limit_key_rejected(self, sample_config):
+        """Test that an unknown rate_limit_key fails config loading"""
+        config = sample_config.copy()
+        config['rate_limit_key'] = 'hostname'
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(config, f)
+            temp_config = f.name
+        
+        try:
+            with pytest.raises(SystemExit):
+                ConfigurableSocketServer(temp_config)
+        finally:
+            os.unlink(temp_config)
 
 
 class TestEnhancedSizeLimits:
@@ -433,7 +685,7 @@ class TestEnhancedSizeLimits:
         finally:
             os.unlink(temp_config)
     
-    @patch('subprocess.run')
+    @patch.object(socket_server, 'run_capped')
     def test_output_truncation_with_message(self, mock_subprocess, config_file):
         """Test that output truncation includes helpful message"""
         server = ConfigurableSocketServer(config_file)
@@ -442,8 +694,8 @@ class TestEnhancedSizeLimits:
         # Mock large output
         mock_result = Mock()
         mock_result.returncode = 0
-        mock_result.stdout = "x" * 50  # Exceeds limit
-        mock_result.stderr = ""
+        mock_result.stdout = b"x" * 50  # Exceeds limit
+        mock_result.stderr = b""
         mock_subprocess.return_value = mock_result
         
         request = {"command": "simple"}
@@ -452,6 +704,34 @@ class TestEnhancedSizeLimits:
         assert result["success"] == True
         assert len(result["stdout"]) <= server.max_output_size + 50  # Allow for truncation message
         assert "truncated" in result["stdout"]
+    
+    @patch.object(socket_server, 'run_capped')
+    def test_output_is_decoded_leniently(self, mock_subprocess, config_file):
+        """Test that output that isn't valid UTF-8 is decoded with replacement characters"""
+        server = ConfigurableSocketServer(config_file)
+        
+        mock_result = Mock()
+        mock_result.returncode = 0
+        mock_result.stdout = 'héllo'.encode('utf-8') + b'\xff'
+        mock_result.stderr = b''
+        mock_subprocess.return_value = mock_result
+        
+        result = server.execute_command({"command": "echo"})
+        
+        assert result["success"] == True
+        assert result["stdout"] == 'héllo\ufffd'
+        assert 'text' not in mock_subprocess.call_args[1]
+    
+    def test_output_whitespace_is_stripped(self, config_file):
+        """Test that output is stripped like str.strip, trimming ASCII whitespace before decoding"""
+        server = ConfigurableSocketServer(config_file)
+        
+        assert server.decode_output(bytearray(b"\n  ok\n\n")) == "ok"
+        assert server.decode_output(b"ok\n\x1c\xe2\x80\xa8\n") == "ok"
+        assert server.decode_output(b" \t\n") == ""
+        
+        server.max_output_size = 4
+        assert server.decode_output(b"  ab  cd") == "ab\n... (output truncated)"
 
 
 class TestEnhancedSecurity:
@@ -482,10 +762,38 @@ class TestEnhancedSecurity:
             assert server.validate_executable_path(['/tmp/malicious']) == False
             assert server.validate_executable_path(['/etc/passwd']) == False
             assert server.validate_executable_path(['../../bin/evil']) == False
+            assert server.validate_executable_path(['/usr/bin/../../tmp/malicious']) == False
             
         finally:
             os.unlink(temp_config)
     
+    def test_allowed_dirs_match_whole_directories(self, config_file):
+        """Test that an allowed dir without a trailing slash doesn't allow sibling directories"""
+        server = ConfigurableSocketServer(config_file)
+        
+        assert socket_server.allowed_dir_prefixes(['/usr/bin', '/bin/', '/']) == ('/usr/bin/', '/bin/', '/')
+        assert server.validate_executable_path(['/usr/bin/echo'], {'allowed_executable_dirs': ['/usr/bin']}) == True
+        assert server.validate_executable_path(['/usr/bin/echo'], {'allowed_executable_dirs': ['/usr/bi']}) == False
+    
+    def test_executable_resolved_inside_allowed_dirs(self, config_file):
+        """Test that a bare executable name is resolved once to a binary in the allowed dirs"""
+        server = ConfigurableSocketServer(config_file)
+        
+        with tempfile.TemporaryDirectory() as untrusted_dir:
+            # An 'echo' earlier on the command's PATH but outside the allowed dirs is skipped
+            fake_echo = os.path.join(untrusted_dir, 'echo')
+            with open(fake_echo, 'w') as f:
+                f.write('#!/bin/sh\n')
+            os.chmod(fake_echo, 0o755)
+            
+            cmd_config = {'executable': ['echo', 'hi'], 'env': {'PATH': f'{untrusted_dir}:/usr/bin:/bin'}}
+            resolved = server.resolve_command_executable(cmd_config)
+        
+        assert os.path.isabs(resolved[0]) and resolved[0].startswith(('/usr/bin/', '/bin/'))
+        assert resolved[1:] == ['hi']
+        assert server.resolve_command_executable({'executable': ['no-such-tool']}) == ['no-such-tool']
+        assert server.resolve_command_executable({'executable': ['/usr/bin/echo']}) == ['/usr/bin/echo']
+    
     def test_executable_path_validation_without_allowed_dirs(self, sample_config):
         """Test that validation fails gracefully without allowed_executable_dirs"""
         config = sample_config.copy()
@@ -567,6 +875,16 @@ class TestEnhancedParameterValidation:
         finally:
             os.unlink(temp_config)
     
+    def test_parameter_max_length_checked_before_pattern(self, config_file):
+        """Test that an overlong value is rejected without running a backtracking-prone pattern"""
+        server = ConfigurableSocketServer(config_file)
+        param_config = {'type': 'string', 'pattern': '^(a+)+$', 'max_length': 20}
+        
+        start = time.monotonic()
+        assert server.validate_parameter_value('a' * 5000 + 'b', param_config) == False
+        assert time.monotonic() - start < 1
+        assert server.validate_parameter_value('a' * 20, param_config) == True
+    
     def test_parameter_enum_validation(self, sample_config):
         """Test parameter enum validation"""
         config = sample_config.copy()
@@ -656,12 +974,78 @@ class TestThreadingSupport:
             assert server.config.get('enable_threading') == True
         finally:
             os.unlink(temp_config)
+    
+    def test_worker_threads_configuration(self, sample_config, config_file):
+        """Test that the worker pool size has a bounded default and can be configured"""
+        server = ConfigurableSocketServer(config_file)
+        assert 1 <= server.worker_threads <= 32
+        
+        config = sample_config.copy()
+        config['enable_threading'] = True
+        config['worker_threads'] = 4
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(config, f)
+            temp_config = f.name
+        
+        try:
+            server = ConfigurableSocketServer(temp_config)
+            assert server.worker_threads == 4
+        finally:
+            os.unlink(temp_config)
+    
+    def test_full_connection_queue_rejects_client(self, config_file):
+        """Test that connections beyond the worker and queue slots are turned away"""
+        server = ConfigurableSocketServer(config_file)
+        server.connection_slots = threading.Semaphore(1)
+        server.executor = Mock()
+        first_client, first_server = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        second_client, second_server = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        
+        try:
+            server.dispatch_client(first_server, '')
+            server.executor.submit.assert_called_once_with(server.handle_pooled_client, first_server, '')
+            
+            # No slot left: the second client gets a busy error and a closed connection
+            server.dispatch_client(second_server, '')
+            assert server.executor.submit.call_count == 1
+            assert json.loads(second_client.recv(65536))["error"] == "Server busy, try again later"
+            assert second_client.recv(1) == b''
+            
+            # Finishing the first connection frees its slot
+            with patch.object(server, 'handle_client'):
+                server.handle_pooled_client(first_server, '')
+            assert server.connection_slots.acquire(blocking=False)
+        finally:
+            for sock in (first_client, first_server, second_client):
+                sock.close()
+    
+    def test_worker_restarts_back_off_after_fast_exits(self, config_file):
+        """Test that workers dying right after starting are restarted with a growing delay"""
+        server = ConfigurableSocketServer(config_file)
+        server.running = True
+        server.worker_processes = 1
+        pids = iter(range(100, 110))
+        
+        def spawn():
+            pid = next(pids)
+            server.worker_pids[pid] = time.monotonic()
+            return pid
+        
+        # Every worker exits immediately; the fourth wait finds no children left
+        exits = [(100, 256), (101, 256), (102, 256), ChildProcessError()]
+        with patch.object(server, 'spawn_worker_process', side_effect=spawn), \
+             patch.object(socket_server.os, 'wait', side_effect=exits), \
+             patch.object(socket_server, 'sleep') as mock_sleep:
+            assert server.run_worker_processes() == False
+        
+        assert [call.args[0] for call in mock_sleep.call_args_list] == [0.2, 0.4, 0.8]
 
 
 class TestDebugMode:
     """Test cases for debug mode functionality"""
     
-    @patch('subprocess.run')
+    @patch.object(socket_server, 'run_capped')
     def test_debug_mode_enabled_shows_details(self, mock_subprocess, sample_config):
         """Test that debug mode shows detailed error information"""
         config = sample_config.copy()
@@ -686,7 +1070,7 @@ class TestDebugMode:
         finally:
             os.unlink(temp_config)
     
-    @patch('subprocess.run')
+    @patch.object(socket_server, 'run_capped')
     def test_debug_mode_disabled_hides_details(self, mock_subprocess, sample_config):
         """Test that production mode hides detailed error information"""
         config = sample_config.copy()
@@ -710,12 +1094,32 @@ class TestDebugMode:
             assert "Sensitive internal error" not in str(result)
         finally:
             os.unlink(temp_config)
+    
+    def test_request_debug_log_formatted_only_when_enabled(self, config_file):
+        """Test that the per-request debug log doesn't format the request unless DEBUG is on"""
+        server = ConfigurableSocketServer(config_file)
+        
+        class Request(dict):
+            formatted = 0
+            
+            def __repr__(self):
+                Request.formatted += 1
+                return dict.__repr__(self)
+        
+        original_level = server.logger.level
+        for level in (logging.INFO, logging.DEBUG):
+            server.logger.setLevel(level)
+            with patch.object(server, 'receive_request', return_value=Request(command="__list__")):
+                server.handle_request(Mock(), "client", "client")
+            # Formatted by each log handler once DEBUG is enabled, never before
+            assert (Request.formatted > 0) == (level == logging.DEBUG)
+        server.logger.setLevel(original_level)
 
 
 class TestEnhancedResponseFormatting:
     """Test cases for enhanced response formatting"""
     
-    @patch('subprocess.run')
+    @patch.object(socket_server, 'run_capped')
     def test_custom_response_formatting(self, mock_subprocess, sample_config):
         """Test custom response formatting configuration"""
         config = sample_config.copy()
@@ -736,8 +1140,8 @@ class TestEnhancedResponseFormatting:
             # Mock JSON output
             mock_result = Mock()
             mock_result.returncode = 0
-            mock_result.stdout = '{"key": "value", "number": 42}'
-            mock_result.stderr = ''
+            mock_result.stdout = b'{"key": "value", "number": 42}'
+            mock_result.stderr = b''
             mock_subprocess.return_value = mock_result
             
             request = {"command": "json_response"}
@@ -750,7 +1154,7 @@ class TestEnhancedResponseFormatting:
         finally:
             os.unlink(temp_config)
     
-    @patch('subprocess.run')
+    @patch.object(socket_server, 'run_capped')
     def test_json_parse_error_handling(self, mock_subprocess, sample_config):
         """Test handling of JSON parse errors in response formatting"""
         config = sample_config.copy()
@@ -771,8 +1175,8 @@ class TestEnhancedResponseFormatting:
             # Mock invalid JSON output
             mock_result = Mock()
             mock_result.returncode = 0
-            mock_result.stdout = 'not valid json {'
-            mock_result.stderr = ''
+            mock_result.stdout = b'not valid json {'
+            mock_result.stderr = b''
             mock_subprocess.return_value = mock_result
             
             request = {"command": "bad_json"}
@@ -783,6 +1187,120 @@ class TestEnhancedResponseFormatting:
             assert "not valid JSON" in result["parse_error"]
         finally:
             os.unlink(temp_config)
+    
+    def test_send_response_is_compact_json(self, config_file):
+        """Test that responses are sent as compact JSON"""
+        server = ConfigurableSocketServer(config_file)
+        mock_socket = Mock()
+        
+        server.send_response(mock_socket, {"success": True, "stdout": "a b", "items": [1, 2]})
+        
+        mock_socket.sendall.assert_called_once_with(b'{"success":true,"stdout":"a b","items":[1,2]}')
+    
+    def test_send_response_without_orjson(self, config_file):
+        """Test that responses encode identically with the stdlib when orjson is not installed"""
+        server = ConfigurableSocketServer(config_file)
+        mock_socket = Mock()
+        
+        with patch.object(socket_server, 'orjson', None):
+            server.send_response(mock_socket, {"success": True, "stdout": "a b", "items": [1, 2]})
+        
+        mock_socket.sendall.assert_called_once_with(b'{"success":true,"stdout":"a b","items":[1,2]}')
+    
+    def test_json_helpers_fall_back_to_stdlib(self):
+        """Test that values orjson rejects are still handled by the stdlib"""
+        big = 2 ** 70
+        assert socket_server.loads_json(str(big)) == big
+        assert json.loads(socket_server.dumps_json({"value": big, 1: "int key"})) == {"value": big, "1": "int key"}
+        with pytest.raises(json.JSONDecodeError):
+            socket_server.loads_json('{"command": ')
+    
+    def test_loads_json_keeps_big_ints_exact(self):
+        """Test that integers beyond 64 bits aren't parsed as floats"""
+        big = 123456789012345678901234567890
+        for data in ('{"n": %d}' % big, b'{"n": %d}' % big, b'{"n": -%d}' % big):
+            value = socket_server.loads_json(data)["n"]
+            assert type(value) is int
+            assert abs(value) == big
+    
+    def test_introspection_sends_cached_payload(self, config_file):
+        """Test that a plain introspection request is answered with the bytes encoded at startup"""
+        server = ConfigurableSocketServer(config_file)
+        mock_socket = Mock()
+        
+        with patch.object(server, 'receive_request', return_value={"command": "__introspect__"}), \
+             patch.object(server, 'encode_response') as mock_encode:
+            assert server.handle_request(mock_socket, "client", "client") == False
+        
+        mock_encode.assert_not_called()
+        mock_socket.sendall.assert_called_once_with(server.introspection_payload)
+        assert json.loads(server.introspection_payload)["server_info"]["name"] == server.config["name"]
+    
+    def test_list_sends_cached_payload(self, config_file):
+        """Test that a plain __list__ request is answered with the bytes encoded at startup"""
+        server = ConfigurableSocketServer(config_file)
+        mock_socket = Mock()
+        
+        with patch.object(server, 'receive_request', return_value={"command": "__list__"}), \
+             patch.object(server, 'encode_response') as mock_encode:
+            assert server.handle_request(mock_socket, "client", "client") == False
+        
+        mock_encode.assert_not_called()
+        mock_socket.sendall.assert_called_once_with(server.list_payload)
+        assert json.loads(server.list_payload) == {"success": True, "commands": ["echo", "simple", "with-flags"]}
+    
+    def test_introspection_with_request_id_leaves_cache_untouched(self, config_file):
+        """Test that per-request fields are added to a copy of the cached introspection response"""
+        server = ConfigurableSocketServer(config_file)
+        mock_socket = Mock()
+        
+        request = {"command": "__introspect__", "request_id": "abc"}
+        with patch.object(server, 'receive_request', return_value=request):
+            server.handle_request(mock_socket, "client", "client")
+        
+        sent = json.loads(mock_socket.sendall.call_args[0][0])
+        assert sent["request_id"] == "abc"
+        assert "request_id" not in server.introspection_response
+    
+    def test_rate_limited_request_sends_cached_payload(self, config_file):
+        """Test that a rate limited client gets the error encoded at startup, before any read"""
+        server = ConfigurableSocketServer(config_file)
+        mock_socket = Mock()
+        
+        with patch.object(server, 'check_rate_limit', return_value=False), \
+             patch.object(server, 'encode_response') as mock_encode:
+            assert server.handle_request(mock_socket, "client", "client") == False
+        
+        mock_encode.assert_not_called()
+        mock_socket.recv.assert_not_called()
+        sent = json.loads(mock_socket.sendall.call_args[0][0])
+        assert sent == {"success": False, "error": "Rate limit exceeded", "retry_after": server.rate_limit['window']}
+    
+    def test_auth_disabled_skips_validate_auth(self, config_file):
+        """Test that requests skip the auth check entirely when auth is disabled"""
+        server = ConfigurableSocketServer(config_file)
+        assert server.auth_enabled == False
+        
+        with patch.object(server, 'receive_request', return_value={"command": "__ping__"}), \
+             patch.object(server, 'validate_auth') as mock_validate:
+            server.handle_request(Mock(), "client", "client")
+        
+        mock_validate.assert_not_called()
+    
+    def test_ping_sends_preencoded_pong(self, config_file):
+        """Test that a plain ping is answered without building and encoding a response dict"""
+        server = ConfigurableSocketServer(config_file)
+        mock_socket = Mock()
+        
+        with patch.object(server, 'receive_request', return_value={"command": "__ping__"}), \
+             patch.object(server, 'encode_response') as mock_encode:
+            assert server.handle_request(mock_socket, "client", "client") == False
+        
+        mock_encode.assert_not_called()
+        sent = json.loads(mock_socket.sendall.call_args[0][0])
+        assert sent["success"] == True
+        assert sent["message"] == "pong"
+        assert isinstance(sent["timestamp"], float)
 
 
 class TestReceiveFullMessage:
@@ -814,6 +1332,21 @@ class TestReceiveFullMessage:
             server.receive_full_message(mock_socket)
         assert "Invalid UTF-8" in str(excinfo.value)
     
+    def test_receive_request_with_trailing_newline(self, config_file):
+        """Test that a request followed by whitespace is complete without waiting for the timeout"""
+        server = ConfigurableSocketServer(config_file)
+        client_end, server_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        
+        try:
+            client_end.sendall(b'{"command": "__ping__"}\n')
+            start = time.monotonic()
+            
+            assert server.receive_request(server_end) == {"command": "__ping__"}
+            assert time.monotonic() - start < 1
+        finally:
+            client_end.close()
+            server_end.close()
+    
     def test_receive_message_chunked_json(self, config_file):
         """Test receive_full_message with chunked JSON data"""
         server = ConfigurableSocketServer(config_file)
@@ -830,12 +1363,67 @@ class TestReceiveFullMessage:
         assert result == test_message
         parsed = json.loads(result)
         assert parsed["command"] == "test"
+    
+    def test_receive_request_parses_only_at_closing_brace(self, config_file):
+        """Test that chunks ending mid-object are not parsed and split UTF-8 is reassembled"""
+        server = ConfigurableSocketServer(config_file)
+        
+        payload = '{"command": "echo", "parameters": {"message": "héllo"}}'.encode('utf-8')
+        split = payload.index('é'.encode('utf-8')) + 1  # Split inside the multi-byte character
+        mock_socket = Mock()
+        mock_socket.recv.side_effect = [payload[:split], payload[split:-2], payload[-2:]]
+        
+        with patch.object(socket_server, 'loads_json', wraps=socket_server.loads_json) as mock_loads:
+            request = server.receive_request(mock_socket)
+        
+        assert request == {"command": "echo", "parameters": {"message": "héllo"}}
+        assert mock_loads.call_count == 1
+        assert mock_socket.recv.call_count == 3
+    
+    def test_receive_length_prefixed_request(self, config_file):
+        """Test that a length-prefixed request is read to its announced size and parsed once"""
+        server = ConfigurableSocketServer(config_file)
+        
+        payload = json.dumps({"command": "echo", "parameters": {"message": "x}" * 40000}}).encode()
+        client_end, server_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        
+        try:
+            client_end.sendall(struct.pack('>I', len(payload)) + payload)
+            with patch.object(socket_server, 'loads_json', wraps=socket_server.loads_json) as mock_loads:
+                request = server.receive_request(server_end)
+        finally:
+            client_end.close()
+            server_end.close()
+        
+        assert request == {"command": "echo", "parameters": {"message": "x}" * 40000}}
+        assert mock_loads.call_count == 1
+    
+    def test_receive_length_prefixed_request_errors(self, config_file):
+        """Test oversized, overlong and truncated length-prefixed requests"""
+        server = ConfigurableSocketServer(config_file)
+        server.max_request_size = 100
+        
+        cases = [
+            (struct.pack('>I', 101), "Request too large"),
+            (struct.pack('>I', 2) + b'{}{}', "longer than its length prefix"),
+            (struct.pack('>I', 10) + b'{}', "Incomplete request"),
+        ]
+        for data, error in cases:
+            client_end, server_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                client_end.sendall(data)
+                client_end.shutdown(socket.SHUT_WR)
+                with pytest.raises(ValueError, match=error):
+                    server.receive_request(server_end)
+            finally:
+                client_end.close()
+                server_end.close()
 
 
 class TestErrorHandling:
     """Test cases for improved error handling"""
     
-    @patch('subprocess.run')
+    @patch.object(socket_server, 'run_capped')
     def test_command_timeout_with_custom_timeout(self, mock_subprocess, sample_config):
         """Test command timeout with custom timeout value"""
         config = sample_config.copy()
@@ -863,4 +1451,244 @@ class TestErrorHandling:
             assert "timeout" in result["error"].lower()
             assert "1 seconds" in result["error"]
         finally:
-            os.unlink(temp_config)
\ No newline at end of file
+            os.unlink(temp_config)
+
+
+class TestKeepAlive:
+    """Test cases for serving several requests on one connection"""
+    
+    def _exchange(self, sock, request):
+        sock.sendall(json.dumps(request).encode())
+        return json.loads(sock.recv(65536).decode())
+    
+    def make_server(self, sample_config, temp_socket_path, enable_threading=True):
+        config = sample_config.copy()
+        config['socket_path'] = temp_socket_path
+        config['enable_threading'] = enable_threading
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(config, f)
+            temp_config = f.name
+        
+        try:
+            return ConfigurableSocketServer(temp_config)
+        finally:
+            os.unlink(temp_config)
+    
+    def test_keep_alive_serves_multiple_requests(self, sample_config, temp_socket_path):
+        """Test that keep-alive requests reuse the same connection"""
+        server = self.make_server(sample_config, temp_socket_path)
+        client_end, server_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        handler = threading.Thread(target=server.handle_client, args=(server_end, ''))
+        handler.start()
+        
+        try:
+            first = self._exchange(client_end, {"command": "__ping__", "keep_alive": True})
+            assert first["success"] == True
+            assert first["keep_alive"] == True
+            
+            # Final request without keep-alive makes the server close the connection
+            second = self._exchange(client_end, {"command": "__ping__"})
+            assert second["success"] == True
+            assert "keep_alive" not in second
+            assert client_end.recv(1) == b''
+        finally:
+            client_end.close()
+            handler.join(timeout=5)
+        
+        assert not handler.is_alive()
+        
+        # Both requests were recorded in the latency histogram
+        stats = server.execute_command({"command": "__stats__"})
+        assert stats["success"] == True
+        assert stats["requests"] == 2
+        assert sum(bucket["count"] for bucket in stats["latency_histogram"]) == 2
+    
+    def test_keep_alive_idle_connection_closes(self, sample_config, temp_socket_path):
+        """Test that an idle keep-alive connection is closed after the timeout"""
+        server = self.make_server(sample_config, temp_socket_path)
+        server.keep_alive_timeout = 0.1
+        client_end, server_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        
+        try:
+            client_end.sendall(json.dumps({"command": "__ping__", "keep_alive": True}).encode())
+            server.handle_client(server_end, '')
+            
+            response = json.loads(client_end.recv(65536).decode())
+            assert response["success"] == True
+            assert client_end.recv(1) == b''
+        finally:
+            client_end.close()
+    
+    def test_keep_alive_ignored_when_serving_serially(self, sample_config, temp_socket_path):
+        """Test that a serial server answers keep-alive requests and closes instead of blocking its accept loop"""
+        server = self.make_server(sample_config, temp_socket_path, enable_threading=False)
+        server.keep_alive_timeout = 30
+        client_end, server_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        
+        try:
+            client_end.sendall(json.dumps({"command": "__ping__", "keep_alive": True}).encode())
+            start = time.monotonic()
+            server.handle_client(server_end, '')
+            
+            assert time.monotonic() - start < 5
+            response = json.loads(client_end.recv(65536).decode())
+            assert response["success"] == True
+            assert "keep_alive" not in response
+            assert client_end.recv(1) == b''
+        finally:
+            client_end.close()
+
+
+class TestPersistentCommands:
+    """Test cases for commands served by a long-lived process"""
+    
+    # Replies to each frame with the 'message' parameter upper-cased; an
+    # empty message fails with returncode 2
+    WORKER = (
+        "import json, struct, sys\n"
+        "while True:\n"
+        "    header = sys.stdin.buffer.read(4)\n"
+        "    if len(header) < 4:\n"
+        "        break\n"
+        "    request = json.loads(sys.stdin.buffer.read(struct.unpack('>I', header)[0]))\n"
+        "    message = request['parameters'].get('message', '')\n"
+        "    if message:\n"
+        "        reply = json.dumps({'stdout': message.upper()}).encode()\n"
+        "    else:\n"
+        "        reply = json.dumps({'returncode': 2, 'stderr': 'no message\\n'}).encode()\n"
+        "    sys.stdout.buffer.write(struct.pack('>I', len(reply)) + reply)\n"
+        "    sys.stdout.buffer.flush()\n"
+    )
+    
+    def make_server(self, sample_config, script, timeout=5):
+        config = sample_config.copy()
+        config['allowed_executable_dirs'] = [os.path.dirname(sys.executable) + '/']
+        config['commands'] = {
+            'upper': {
+                'executable': [sys.executable, '-c', script],
+                'persistent': True,
+                'timeout': timeout,
+                'parameters': {'message': {'type': 'string', 'style': 'argument'}}
+            }
+        }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(config, f)
+            temp_config = f.name
+        
+        try:
+            return ConfigurableSocketServer(temp_config)
+        finally:
+            os.unlink(temp_config)
+    
+    def test_persistent_command_reuses_process(self, sample_config):
+        """Test that requests are answered by one long-lived process"""
+        server = self.make_server(sample_config, self.WORKER)
+        try:
+            first = server.execute_command({"command": "upper", "parameters": {"message": "hello"}})
+            pid = server.persistent_commands['upper'].process.pid
+            second = server.execute_command({"command": "upper", "parameters": {"message": "again"}})
+            
+            assert first["success"] == True
+            assert first["stdout"] == "HELLO"
+            assert second["stdout"] == "AGAIN"
+            assert server.persistent_commands['upper'].process.pid == pid
+        finally:
+            server.cleanup()
+    
+    def test_persistent_command_failure_reply(self, sample_config):
+        """Test that a reply's returncode and stderr map onto the response"""
+        server = self.make_server(sample_config, self.WORKER)
+        try:
+            result = server.execute_command({"command": "upper"})
+            
+            assert result["success"] == False
+            assert result["returncode"] == 2
+            assert result["stdout"] == ""
+            assert result["stderr"] == "no message"
+            
+            # The process stays up for the next request
+            assert server.execute_command({"command": "upper", "parameters": {"message": "ok"}})["stdout"] == "OK"
+        finally:
+            server.cleanup()
+    
+    def test_persistent_command_invalid_reply(self, sample_config):
+        """Test that a reply that isn't a JSON envelope fails the request and restarts the process"""
+        server = self.make_server(sample_config, self.WORKER.replace(
+            "json.dumps({'stdout': message.upper()}).encode()", "message.upper().encode()"))
+        try:
+            result = server.execute_command({"command": "upper", "parameters": {"message": "hello"}})
+            
+            assert result["success"] == False
+            assert result["error"] == "Command execution failed"
+            assert server.persistent_commands['upper'].process is None
+        finally:
+            server.cleanup()
+    
+    def test_persistent_command_drops_undeclared_parameters(self, sample_config):
+        """Test that only declared parameters are forwarded to the process"""
+        server = self.make_server(sample_config, self.WORKER.replace(
+            "json.dumps({'stdout': message.upper()})", "json.dumps({'stdout': json.dumps(request['parameters'])})"))
+        try:
+            result = server.execute_command({"command": "upper", "parameters": {
+                "message": "ok", "evil": "; rm -rf / $(x)", "n": [1, 2]
+            }})
+            
+            assert result["success"] == True
+            assert json.loads(result["stdout"]) == {"message": "ok"}
+        finally:
+            server.cleanup()
+    
+    def test_persistent_command_respawns_after_exit(self, sample_config):
+        """Test that a process that exits is replaced on the next request"""
+        server = self.make_server(sample_config, self.WORKER.replace("    sys.stdout.buffer.flush()\n",
+                                                                     "    sys.stdout.buffer.flush()\n    break\n"))
+        try:
+            for message in ("one", "two"):
+                result = server.execute_command({"command": "upper", "parameters": {"message": message}})
+                assert result["stdout"] == message.upper()
+                server.persistent_commands['upper'].process.wait(timeout=5)
+        finally:
+            server.cleanup()
+    
+    def test_persistent_command_timeout_kills_process(self, sample_config):
+        """Test that a process that doesn't reply in time is killed"""
+        server = self.make_server(sample_config, "import time; time.sleep(30)", timeout=0.5)
+        try:
+            result = server.execute_command({"command": "upper", "parameters": {"message": "hello"}})
+            
+            assert result["success"] == False
+            assert "timeout" in result["error"]
+            assert server.persistent_commands['upper'].process is None
+        finally:
+            server.cleanup()
+    
+    def test_persistent_command_write_timeout(self, sample_config):
+        """Test that a request bigger than the pipe buffer can't block on a process that stops reading"""
+        server = self.make_server(sample_config, "import time; time.sleep(30)", timeout=0.5)
+        try:
+            start = time.monotonic()
+            result = server.execute_command({"command": "upper", "parameters": {"message": "x" * 1048576}})
+            
+            assert result["success"] == False
+            assert "timeout" in result["error"]
+            assert time.monotonic() - start < 5
+            assert server.persistent_commands['upper'].process is None
+        finally:
+            server.cleanup()
+    
+    def test_unsupported_protocol_rejected(self, sample_config):
+        """Test that persistent commands only accept the length_prefixed protocol"""
+        config = sample_config.copy()
+        config['commands'] = {'bad': {'executable': ['echo'], 'persistent': True, 'protocol': 'lines'}}
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+            json.dump(config, f)
+            temp_config = f.name
+        
+        try:
+            with pytest.raises(SystemExit):
+                ConfigurableSocketServer(temp_config)
+        finally:
+            os.unlink(temp_config)